@@ -35,6 +35,9 @@ sys.path.insert(0, comroot)
 
 from commondataexport.getargvalue    import getargvalue, getarg
 from commondataexport.dataextractmap import DataExtractMap, find_entity_url
+from commondataexport.fetch_engine   import (
+    SerialFetchEngine, ThreadPoolFetchEngine, set_fetch_engine, get_fetch_engine
+    )
 
 from commondataexport.emplaces_defs import (
     SKOS, XSD, SCHEMA, OA, CC, DCTERMS, FOAF, BIBO,
@@ -285,6 +288,18 @@ annalist_merged_place_mapping = (
         )
     ])
 
+annalist_resource_mapping = (
+    [ M.set_subj(M.prop_eq(ANNAL.uri), M.src_obj)
+    , M.emit(M.prop_ne(ANNAL.uri), M.stmt_copy())
+    ])
+
+#   Place and resource mapping tables are compiled once, when this module is 
+#   loaded, and the resulting plans used for each reference (see `run_plan`)
+
+annalist_sourced_place_plan = M.compile_map(annalist_sourced_place_mapping)
+annalist_merged_place_plan  = M.compile_map(annalist_merged_place_mapping)
+annalist_resource_plan      = M.compile_map(annalist_resource_mapping)
+
 #   ===================================================================
 #
 #   Command line parsing and help
@@ -382,6 +397,15 @@ def parseCommandArgs(argv):
                              "defintions in the output graph."+
                              ""
                         )
+    parser.add_argument("--prefetch-threads",
+                        type=int,
+                        dest="prefetch_threads",
+                        default=4,
+                        help="Number of threads used to retrieve referenced Annalist "+
+                             "entities before mapping them.  "+
+                             "Use 0 to disable prefetching."+
+                             ""
+                        )
     parser.add_argument("command", metavar="COMMAND",
                         nargs=None,
                         help="sub-command, one of the options listed below."
@@ -514,21 +538,15 @@ def get_annalist_resource_data(gadroot, annalist_ref, resource_rdf=None):
     if resource_rdf is None:
         resource_rdf = Graph()
         add_emplaces_common_namespaces(resource_rdf)
-    M = DataExtractMap
-    # ----- mapping table -----
-    annalist_data_mapping = (
-        [ M.set_subj(M.prop_eq(ANNAL.uri), M.src_obj)
-        , M.emit(M.prop_ne(ANNAL.uri), M.stmt_copy())
-        ])
     # -----
     m = DataExtractMap(annalist_uri, annalist_rdf, resource_rdf)
-    m.extract_map(annalist_data_mapping)
+    m.run_plan(annalist_resource_plan)
     return resource_rdf
 
-def get_annalist_ref_data(gadroot, annalist_ref, mapping, emplaces_rdf=None):
+def get_annalist_ref_data(gadroot, annalist_ref, mapping, plan, emplaces_rdf=None):
     """
     Build EMPlaces place data for a specified Annalist place reference,
-    using an indicated mapping table.
+    using an indicated mapping table and its compiled plan.
     """
     annalist_uri, annalist_url = get_annalist_uri(annalist_ref)
     annalist_rdf = get_annalist_graph_data(annalist_url)
@@ -538,7 +556,9 @@ def get_annalist_ref_data(gadroot, annalist_ref, mapping, emplaces_rdf=None):
         add_emplaces_common_namespaces(emplaces_rdf)
     # -----
     m = DataExtractMap(annalist_uri, annalist_rdf, emplaces_rdf)
-    m.extract_map(mapping)
+    if get_fetch_engine().concurrent:
+        m.prefetch_refs(mapping)
+    m.run_plan(plan)
     return emplaces_rdf
 
 def get_common_defs(options, emplaces_rdf):
@@ -680,7 +700,7 @@ def do_get_merged_place_data(gadroot, options):
     annalist_ref = getargvalue(getarg(options.args, 0), "Annalist ref: ")
     emplaces_rdf = get_annalist_ref_data(
         gadroot, annalist_ref,
-        annalist_merged_place_mapping
+        annalist_merged_place_mapping, annalist_merged_place_plan
         )
     get_common_defs(options, emplaces_rdf)
     print(emplaces_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
@@ -693,7 +713,7 @@ def do_get_source_place_data(gadroot, options):
     annalist_ref = getargvalue(getarg(options.args, 0), "Annalist ref: ")
     emplaces_rdf = get_annalist_ref_data(
         gadroot, annalist_ref,
-        annalist_sourced_place_mapping
+        annalist_sourced_place_mapping, annalist_sourced_place_plan
         )
     get_common_defs(options, emplaces_rdf)
     print(emplaces_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
@@ -778,6 +798,10 @@ def runCommand(userhome, userconfig, argv):
     log.debug("runCommand: userhome %s, userconfig %s, argv %s"%(userhome, userconfig, repr(argv)))
     log.debug("Options: %s"%(repr(options)))
     if options:
+        if options.prefetch_threads > 0:
+            set_fetch_engine(ThreadPoolFetchEngine(options.prefetch_threads))
+        else:
+            set_fetch_engine(SerialFetchEngine())
         progname = os.path.basename(argv[0])
         status   = run(userhome, userconfig, options, progname)
     else:
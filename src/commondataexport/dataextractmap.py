@@ -22,10 +22,16 @@ import errno
 import requests
 import urllib
 import urlparse
+import threading
+import weakref
 
 from rdflib         import Graph, Namespace, URIRef, Literal, BNode, RDF, RDFS
 from rdflib.paths   import Path
 
+from http_transport import get_http_transport
+from graph_cache    import LRUGraphCache
+from fetch_engine   import get_fetch_engine
+
 log = logging.getLogger(__name__)
 
 def merge_two_dicts(x, y):
@@ -47,7 +53,7 @@ def http_get(url, req_headers={}):
     """
     Issue an HTTP GET request to the supplied URL, and return the result data.
     """
-    response = requests.get(url, headers=req_headers)
+    response = get_http_transport().get(url, req_headers=req_headers)
     response.raise_for_status()  # raise an error on unsuccessful status codes
     return response.text
 
@@ -69,7 +75,7 @@ def find_entity_url(entity_uri, content_type="text/turtle"):
     req_headers = (
         { "accept":     content_type 
         })
-    response = requests.head(entity_uri, headers=req_headers, allow_redirects=True)
+    response = get_http_transport().head(entity_uri, req_headers=req_headers, allow_redirects=True)
     response.raise_for_status()  # raise an error on unsuccessful status codes
     return response.url    
 
@@ -83,37 +89,194 @@ def load_rdf_text(entity_url, format="turtle"):
     req_headers = (
         { "accept":     rdf_content_type 
         })
-    response = requests.get(entity_url, headers=req_headers)
+    response = get_http_transport().get(entity_url, req_headers=req_headers)
     response.raise_for_status()  # raise an error on unsuccessful status codes
     return response.text
 
 class RDFDataCache(object):
 
     def __init__(self):
-        self._graph_cache = {}
+        self._graph_cache = LRUGraphCache("Rdf_graph_cache")
         return
 
+    def has_graph(self, entity_url):
+        """
+        Returns True if a graph for the indicated URL is held in the cache.
+        """
+        return entity_url in self._graph_cache
+
     def get_graph(self, entity_url, format="turtle"):
-        if entity_url not in self._graph_cache:
+        """
+        Returns a graph for the indicated URL.  Graphs not held in memory
+        (including any evicted from the cache) are loaded using `get_rdf_graph`,
+        which reads from the disk cache where possible.
+        """
+        # Imported here as rdf_data_utils imports this module
+        from rdf_data_utils import get_rdf_graph
+        g = self._graph_cache.get(entity_url)
+        if g is None:
             try:
-                rdf_text = load_rdf_text(entity_url, format=format)
+                g = get_rdf_graph(entity_url, format=format)
             except Exception as e:
                 print("RDF load error '%s' (%s)"%(entity_url, e), file=sys.stderr)
-            g = Graph()
-            try:
-                g.parse(data=rdf_text, format=format)
-                self._graph_cache[entity_url] = g
-            except Exception as e:
-                print("RDF parse error '%s' (%s)"%(entity_url, e), file=sys.stderr)
-            # result = g.parse(data=r.content, publicID=u, format="turtle")
-            # result = g.parse(source=s, publicID=b, format="json-ld")
-        return self._graph_cache[entity_url]
+                raise
+            self._graph_cache.put(entity_url, g)
+        return g
 
 Rdf_graph_cache = RDFDataCache()
 
+class PredicateIndex(object):
+    """
+    Index of the statements about each subject in a source graph, grouped by
+    predicate, with predicates also grouped by namespace (or any other URI prefix)
+    when a selector asks for them.
+
+    The index for each subject is built when first used, and then re-used by 
+    all selectors applied to that subject.
+    """
+
+    def __init__(self, src):
+        self._size     = len(src)
+        self._src_ref  = weakref.ref(src)   # Don't keep graph alive
+        self._subjects = {}     # subject -> (predicate -> [stmt], prefix -> frozenset)
+        return
+
+    def is_current(self, src):
+        """
+        Returns True if the index was built for the supplied graph in its current 
+        state.  (The number of statements in the graph is used to detect changes.)
+        """
+        return self._src_ref() is src and self._size == len(src)
+
+    def _subject_entry(self, subj):
+        entry = self._subjects.get(subj)
+        if entry is None:
+            pred_stmts = {}
+            for stmt in self._src_ref().triples((subj, None, None)):
+                pred_stmts.setdefault(stmt[1], []).append(stmt)
+            entry = (pred_stmts, {})
+            self._subjects[subj] = entry
+        return entry
+
+    def subject_predicates(self, subj):
+        """
+        Returns a dictionary of lists of statements about the indicated subject, 
+        keyed by predicate.
+        """
+        return self._subject_entry(subj)[0]
+
+    def prefix_predicates(self, subj, prefix):
+        """
+        Returns a set of predicates used with the indicated subject that start
+        with the supplied URI prefix.
+        """
+        pred_stmts, prefix_preds = self._subject_entry(subj)
+        preds = prefix_preds.get(prefix)
+        if preds is None:
+            preds = frozenset(p for p in pred_stmts if str(p).startswith(prefix))
+            prefix_preds[prefix] = preds
+        return preds
+
+_predicate_indexes      = {}    # id(graph) -> (weakref(graph), PredicateIndex)
+_predicate_indexes_lock = threading.RLock()
+
+def get_predicate_index(src):
+    """
+    Returns a predicate index for the supplied graph, which is shared by all
+    selectors applied to the graph while it is unchanged.
+    """
+    src_id = id(src)
+    with _predicate_indexes_lock:
+        entry = _predicate_indexes.get(src_id)
+        if entry and entry[1].is_current(src):
+            return entry[1]
+        def discard(ref):
+            with _predicate_indexes_lock:
+                if _predicate_indexes.get(src_id, (None,))[0] is ref:
+                    del _predicate_indexes[src_id]
+            return
+        index = PredicateIndex(src)
+        _predicate_indexes[src_id] = (weakref.ref(src, discard), index)
+    return index
+
 class EmptySelection(ValueError):
     pass
 
+class MapParam(object):
+    """
+    Parameter slot in a mapping table.
+
+    A mapping table that uses parameter slots can be built once, and then used 
+    many times with different values supplied by the `params` argument of 
+    `DataExtractMap`.  A parameter slot may be used as a value generator, or 
+    as the object value of `stmt_gen`.
+    """
+
+    def __init__(self, name, make_node=None):
+        """
+        name        is the name of a parameter, or a template into which 
+                    parameter values are interpolated using '%(name)s'.
+        make_node   if specified, is a function applied to the parameter 
+                    value or interpolated template, and which returns a node.
+                    If not specified, `name` is a parameter name, whose value 
+                    is used directly.
+        """
+        self._name      = name
+        self._make_node = make_node
+        return
+
+    def resolve(self, params):
+        """
+        Returns the value of this parameter slot for the supplied parameters.
+        """
+        if self._make_node is None:
+            return params[self._name]
+        return self._make_node(self._name%params)
+
+    def __call__(self, mapper, s, p, o):
+        return self.resolve(mapper._params)
+
+#   Operation codes for compiled mapping plans (see `DataExtractMap.compile_map`)
+#
+#   (OP_CALL, emf)
+#       call an extract/transform function that could not be compiled.
+#   (OP_BIND_SUBJ, prop, obj_kind, obj_val, value)
+#       set the target subject from a value generator applied to a generated statement.
+#   (OP_EMIT_CONST, prop, obj_kind, obj_val)
+#       emit a statement about the target subject with the given property and object.
+#   (OP_SELECT_COPY, selector)
+#       emit a copy of each statement matched by a selector, using the target subject.
+#   (OP_SELECT_EMIT, selector, subgraph)
+#       emit subgraphs generated for each statement matched by a selector.
+#   (OP_DESCEND, prop, obj_kind, obj_val, plan)
+#       apply a compiled plan to a node in the current source graph, and emit a 
+#       statement linking the target subject to the resulting subgraph.
+#
+#   Object values are described by a kind and a value:
+#
+#   (OBJ_NODE, node)    a given node
+#   (OBJ_PARAM, param)  a parameter slot (see `MapParam`)
+#   (OBJ_BNODE, key)    a blank node allocated for each use of a mapping
+
+OP_CALL         = 0
+OP_BIND_SUBJ    = 1
+OP_EMIT_CONST   = 2
+OP_SELECT_COPY  = 3
+OP_SELECT_EMIT  = 4
+OP_DESCEND      = 5
+
+OBJ_NODE        = 0
+OBJ_PARAM       = 1
+OBJ_BNODE       = 2
+
+#   Number of emitted statements buffered before they are added to the target graph
+
+EMIT_BUFFER_SIZE = 1000
+
+#   Number of compiled plans held by `DataExtractMap.get_plan`
+
+PLAN_CACHE_SIZE = 100
+
 class DataExtractMap(object):
     """
     Class and supporting methods for extracting and mapping source data to 
@@ -128,6 +291,10 @@ class DataExtractMap(object):
        extract/transform functions
     3. call extract_map to perform the required transformation
 
+    A mapping table that is used many times may be compiled once using
+    `compile_map`, and the resulting plan used with `run_plan`.  Otherwise,
+    plans are cached by table identity (see `get_plan`).
+
     @@The design of the mapping is evolving. Curently:@@
 
     set_subj(<stmt_select>, <value>)
@@ -166,6 +333,12 @@ class DataExtractMap(object):
                             Unlike 'ref_subgraph', statements about the new subject are
                             scanned from the current source graph.
 
+    <stmt_select> may also be:
+        param_values(<URI>, <name>)
+                            generate statements whose subject is the current base URI, 
+                            property is <URI>, and objects are the members of the list
+                            supplied as parameter <name>.
+
     <value> may be any of the following, which are evaluated by calling
     with a selected statement:
         tgt_subj            target subject: specified by set_subj, or source subject
@@ -178,9 +351,18 @@ class DataExtractMap(object):
         src_obj_or_val(prop) property of referenced resource (obj), or just the 
                             referenced resource.  (Use this for resources that may
                             indicate alternate reference URIs, e.g. using owl:sameAs.)
+        param(name)         value of parameter supplied when the mapping is used.
+        param_literal(template)
+        param_uri(template) literal or URI node from a template into which parameter
+                            values are interpolated using '%(name)s'.
+
+    A mapping table that uses parameters can be built just once, then used with
+    different parameter values for each resource mapped.
     """
 
-    def __init__(self, base, src, tgt, ref_src_subj=None, ref_tgt_subj=None, ref_src_obj=None):
+    def __init__(self, base, src, tgt, 
+            ref_src_subj=None, ref_tgt_subj=None, ref_src_obj=None, 
+            params=None, bnodes=None, emit_buffer=None, memo=None):
         """
         base    is a node in the source graph
         src     source graph, from which data is extracted
@@ -194,6 +376,24 @@ class DataExtractMap(object):
         ref_src_obj 
                 if specified, is the object of a source graph statement 
                 that triggers this mapping.
+        params  if specified, is a dictionary of parameter values used by
+                the mapping table (see `param`).
+        bnodes  if specified, is a dictionary of blank nodes allocated by
+                `stmt_gen`, shared with a referring mapping.  Blank nodes are 
+                allocated afresh for each use of `DataExtractMap`, so that a
+                mapping table may be re-used for different resources.
+        emit_buffer
+                if specified, is a list of statements emitted by a referring 
+                mapping and not yet added to the target graph.  Statements 
+                emitted by this mapping are added to the same list, and are 
+                added to the target graph by the referring mapping.  Otherwise, 
+                emitted statements are added to the target graph when the 
+                buffer is full, and when `extract_map` or `run_plan` completes.
+        memo    if specified, is a dictionary of subgraphs already mapped by a 
+                referring mapping, shared with this mapping (see `_subgraph_key`).
+                A memo may also be shared by mappings of different resources 
+                that add to the same target graph, so that subgraphs common to
+                those resources are mapped just once.
          """
         # print("@@@ DataExtractMap, base %s"%(base,))
         self._base      = base
@@ -203,6 +403,11 @@ class DataExtractMap(object):
         self._ref_src_subj = ref_src_subj
         self._ref_tgt_subj = ref_tgt_subj
         self._ref_src_obj  = ref_src_obj
+        self._params       = params or {}
+        self._bnodes       = {} if bnodes is None else bnodes
+        self._owns_buffer  = emit_buffer is None
+        self._emit_buffer  = [] if emit_buffer is None else emit_buffer
+        self._memo         = {} if memo is None else memo
         return
 
     # Helpers
@@ -210,13 +415,73 @@ class DataExtractMap(object):
 
     def _select(self, selector):
         """
-        selector    is a function that is applied to the source graph and base
-                    node URI, returning an iterator over selected triples from 
-                    the source graph.
+        selector    is a function that is applied to the source graph, base
+                    node URI and this mapping object, returning an iterator over 
+                    selected triples from the source graph.
 
         returns an iterator of statements from source graph that match the selector.
         """
-        return selector(self._src, self._base)
+        return selector(self._src, self._base, self)
+
+    def _bnode(self, key):
+        """
+        Returns a blank node for the indicated key, allocating a new one if 
+        needed for this use of the mapping.
+        """
+        if key not in self._bnodes:
+            self._bnodes[key] = BNode()
+        return self._bnodes[key]
+
+    def _emit(self, stmt):
+        """
+        Adds a statement to the buffer of statements to be added to the target graph.
+        """
+        s, p, o = stmt
+        self._emit_buffer.append((s, p, o, self._tgt))
+        if len(self._emit_buffer) >= EMIT_BUFFER_SIZE:
+            self.flush()
+        return
+
+    def flush(self):
+        """
+        Adds any buffered statements to the target graph.
+        """
+        if self._emit_buffer:
+            self._tgt.addN(self._emit_buffer)
+            del self._emit_buffer[:]
+        return
+
+    def _subgraph_key(self, subgraph_map, subgraph_node, src):
+        """
+        Returns a key for memoizing the result of mapping a subgraph.
+
+        Each subgraph is mapped just once in a single use of `DataExtractMap`
+        (including mappings of subgraphs that it references), and further 
+        references to the same subgraph with the same mapping table emit just 
+        the link to the subgraph.  This assumes the mapped subgraph does not 
+        depend on the referring statement (cf. `ref_tgt_subj`), other than 
+        through the subgraph node.
+
+        A subgraph whose node is not described by the source graph (e.g. a URI
+        generated from parameter values) is mapped from the mapping table and
+        parameters alone, so its key does not depend on the source graph.  
+        Such a subgraph is then mapped just once for all uses of 
+        `DataExtractMap` that share a memo (see `memo` parameter).
+        """
+        if (subgraph_node, None, None) in src:
+            return (id(subgraph_map), subgraph_node, src.identifier)
+        return (id(subgraph_map), subgraph_node)
+
+    def _sub_mapper(self, base, src, s, o):
+        """
+        Returns a new mapping object for a subgraph referenced by statement (s, p, o).
+        Used only for discovery (see `prefetch_refs`), so no statements are emitted.
+        """
+        return DataExtractMap(
+            base, src, self._tgt,
+            ref_src_subj=s, ref_tgt_subj=self._tgt_subj, ref_src_obj=o,
+            params=self._params, bnodes={}
+            )
 
     def _select_single(self, selector):
         """
@@ -248,10 +513,271 @@ class DataExtractMap(object):
 
         Returns the subject resource set by the generated subgraph.
         """
+        return self.run_plan(self.get_plan(data_mapping_table))
+
+    def prefetch_refs(self, data_mapping_table):
+        """
+        Retrieves the graphs that will be dereferenced by `ref_subgraph` and 
+        `ref_list` when the supplied mapping table is applied, using the 
+        currently selected fetch engine so that they may be retrieved 
+        concurrently.  The graphs are held in `Rdf_graph_cache`.
+
+        The mapping table is walked against the graphs already available, and
+        any URLs not yet retrieved are fetched together.  This is repeated until 
+        no new URLs are found, so that references found in retrieved graphs
+        are also fetched.  Errors are logged, and reported again when the 
+        mapping is applied.
+
+        Returns the number of graphs retrieved.
+        """
+        done = {}       # url -> True (fetched) or False (failed)
+        while True:
+            urls  = set()
+            scout = self._sub_mapper(self._base, self._src, self._ref_src_subj, self._ref_src_obj)
+            scout._discover_refs(data_mapping_table, urls, set(), done)
+            if not urls:
+                break
+            log.debug("DataExtractMap.prefetch_refs: %d URLs"%(len(urls),))
+            for url, _, e in get_fetch_engine().map(Rdf_graph_cache.get_graph, sorted(urls)):
+                if e is not None:
+                    log.warning("Prefetch failed for %s (%s)"%(url, e))
+                done[url] = e is None
+        return sum(1 for url in done if done[url])
+
+    def _discover_refs(self, data_mapping_table, urls, visited, done):
+        """
+        Walks a mapping table against the current source graph, and adds to `urls` 
+        any referenced graph URLs not yet retrieved.  Subgraphs in graphs that 
+        have been retrieved are walked in turn.
+
+        visited is a set of (table, URL) pairs that have already been walked.
+        done    is a dictionary of URLs for which retrieval has been attempted.
+        """
         for emf in data_mapping_table:
-            emf(self)
+            map_op = getattr(emf, "map_op", None)
+            try:
+                if map_op and map_op[0] == "set_subj":
+                    emf(self)
+                elif map_op and map_op[0] == "emit":
+                    for s, p, o in list(self._select(map_op[1])):
+                        self._discover_subgraph(map_op[2], s, p, o, urls, visited, done)
+            except Exception as e:
+                log.debug("DataExtractMap._discover_refs: %s"%(e,))
+        return
+
+    def _discover_subgraph(self, subgraph, s, p, o, urls, visited, done):
+        """
+        Discovers referenced graph URLs for a subgraph generator applied to 
+        statement (s, p, o).
+        """
+        ref_gen = getattr(subgraph, "ref_subgraph", None)
+        if ref_gen:
+            self._discover_ref(ref_gen[2](self, s, p, o), ref_gen[3], s, o, urls, visited, done)
+        list_gen = getattr(subgraph, "ref_list", None)
+        if list_gen:
+            cursor = list_gen[2](self, s, p, o)
+            seen   = set()
+            while cursor not in (None, RDF.nil) and cursor not in seen:
+                seen.add(cursor)
+                item = self._src.value(subject=cursor, predicate=RDF.first, any=False)
+                if item is not None:
+                    self._discover_ref(item, list_gen[3], s, o, urls, visited, done)
+                cursor = self._src.value(subject=cursor, predicate=RDF.rest, any=False)
+        loc_gen = getattr(subgraph, "loc_subgraph", None)
+        if loc_gen:
+            node = loc_gen[2](self, s, p, o)
+            self._sub_mapper(node, self._src, s, o)._discover_refs(
+                loc_gen[3], urls, visited, done
+                )
+        alt_gen = getattr(subgraph, "alt_values", None)
+        if alt_gen:
+            alt = alt_gen[1] if alt_gen[0](self, s, p, o) else alt_gen[2]
+            self._discover_subgraph(alt, s, p, o, urls, visited, done)
+        return
+
+    def _discover_ref(self, node, subgraph_map, s, o, urls, visited, done):
+        """
+        Discovers referenced graph URLs for a subgraph in the graph at `node`.
+        """
+        url = str(node)
+        if (id(subgraph_map), url) in visited:
+            return
+        if not Rdf_graph_cache.has_graph(url):
+            if url not in done:
+                urls.add(url)
+                return
+            if not done[url]:
+                return
+        visited.add((id(subgraph_map), url))
+        subgraph_rdf = Rdf_graph_cache.get_graph(url)
+        self._sub_mapper(node, subgraph_rdf, s, o)._discover_refs(
+            subgraph_map, urls, visited, done
+            )
+        return
+
+    @classmethod
+    def compile_map(cls, data_mapping_table, compiled=None):
+        """
+        Compiles a mapping table to a flat list of operations, which can be 
+        applied using `run_plan`.
+
+        Commonly used combinations of selector and subgraph generator are 
+        replaced by operations that generate statements directly, and local 
+        subgraphs are compiled to nested plans which are applied without 
+        creating a new `DataExtractMap` object.  Other entries in the table 
+        are called as extract/transform functions.
+
+        compiled    is used internally, so that a table used for several local
+                    subgraphs is compiled just once.
+        """
+        if compiled is None:
+            compiled = {}
+        table_id = id(data_mapping_table)
+        if table_id in compiled:
+            return compiled[table_id]
+        plan = []
+        compiled[table_id] = plan
+        for emf in data_mapping_table:
+            op = None
+            map_op = getattr(emf, "map_op", None)
+            if map_op and map_op[0] == "set_subj":
+                _, selector, value = map_op
+                sel_gen = getattr(selector, "stmt_gen", None)
+                if sel_gen:
+                    op = (OP_BIND_SUBJ,) + sel_gen + (value,)
+            elif map_op and map_op[0] == "emit":
+                _, selector, subgraph = map_op
+                sel_gen  = getattr(selector, "stmt_gen", None)
+                stmt_gen = getattr(subgraph, "stmt", None)
+                loc_gen  = getattr(subgraph, "loc_subgraph", None)
+                if stmt_gen and cls._is_stmt_copy(*stmt_gen):
+                    if sel_gen:
+                        op = (OP_EMIT_CONST,) + sel_gen
+                    else:
+                        op = (OP_SELECT_COPY, selector)
+                elif ( sel_gen and loc_gen and 
+                       cls._is_stmt_copy(loc_gen[0], loc_gen[1], loc_gen[2]) ):
+                    op = (OP_DESCEND,) + sel_gen + (
+                        cls.compile_map(loc_gen[3], compiled), loc_gen[3]
+                        )
+                else:
+                    op = (OP_SELECT_EMIT, selector, subgraph)
+            plan.append(op or (OP_CALL, emf))
+        return plan
+
+    #   Plans compiled by `get_plan`, keyed by table identity.  Each entry holds
+    #   the table as well as its plan, so that the table's id is not reused.
+
+    _plan_cache = {}
+
+    @classmethod
+    def get_plan(cls, data_mapping_table):
+        """
+        Returns a compiled plan for a mapping table, which is compiled when the 
+        table is first used (see `compile_map`) and then cached.  A mapping 
+        table is assumed not to be changed once it has been used.
+
+        When PLAN_CACHE_SIZE plans are held, the cache is cleared, so that 
+        tables built afresh for each use are not held indefinitely.
+        """
+        table_id = id(data_mapping_table)
+        cached   = cls._plan_cache.get(table_id)
+        if cached is None:
+            if len(cls._plan_cache) >= PLAN_CACHE_SIZE:
+                cls._plan_cache.clear()
+            cached = (data_mapping_table, cls.compile_map(data_mapping_table))
+            cls._plan_cache[table_id] = cached
+        return cached[1]
+
+    @classmethod
+    def _is_stmt_copy(cls, gen_s, gen_p, gen_o):
+        """
+        Returns True if the supplied value generators copy a selected statement
+        to the current target subject.
+        """
+        return (
+            (gen_s == cls.tgt_subj) and 
+            (gen_p == cls.src_prop) and 
+            (gen_o == cls.src_obj)
+            )
+
+    def run_plan(self, plan):
+        """
+        Applies a mapping plan returned by `compile_map` to extract data to
+        the target graph specified in the object constructor.
+
+        Returns the subject resource set by the generated subgraph.
+        """
+        try:
+            tgt_subj = self._run_plan(plan)
+        finally:
+            if self._owns_buffer:
+                self.flush()
+        return tgt_subj
+
+    def _run_plan(self, plan):
+        """
+        Applies a mapping plan, leaving emitted statements in the buffer.
+        """
+        tgt    = self._tgt
+        buffer = self._emit_buffer
+        add    = buffer.append
+        for op in plan:
+            code = op[0]
+            if code == OP_EMIT_CONST:
+                add((self._tgt_subj or self._base, op[1], self._plan_obj(op[2], op[3]), tgt))
+            elif code == OP_SELECT_COPY:
+                tgt_subj = self._tgt_subj
+                for s, p, o in op[1](self._src, self._base, self):
+                    add((tgt_subj or s, p, o, tgt))
+            elif code == OP_DESCEND:
+                node  = self._plan_obj(op[2], op[3])
+                key   = self._subgraph_key(op[5], node, self._src)
+                if key in self._memo:
+                    add((self._tgt_subj or self._base, op[1], self._memo[key] or node, tgt))
+                    continue
+                saved = (
+                    self._base, self._tgt_subj, 
+                    self._ref_src_subj, self._ref_tgt_subj, self._ref_src_obj
+                    )
+                self._ref_src_subj = self._base
+                self._ref_tgt_subj = self._tgt_subj
+                self._ref_src_obj  = node
+                self._base         = node
+                self._tgt_subj     = None
+                try:
+                    subgraph_res = self._run_plan(op[4])
+                finally:
+                    ( self._base, self._tgt_subj, 
+                      self._ref_src_subj, self._ref_tgt_subj, self._ref_src_obj
+                    ) = saved
+                self._memo[key] = subgraph_res
+                add((self._tgt_subj or self._base, op[1], subgraph_res or node, tgt))
+            elif code == OP_SELECT_EMIT:
+                subgraph = op[2]
+                for s, p, o in op[1](self._src, self._base, self):
+                    for stmt in subgraph(self, s, p, o):
+                        add(stmt + (tgt,))
+            elif code == OP_BIND_SUBJ:
+                subj = op[4](self, self._base, op[1], self._plan_obj(op[2], op[3]))
+                if subj:
+                    self._tgt_subj = subj
+            else:
+                op[1](self)
+            if len(buffer) >= EMIT_BUFFER_SIZE:
+                self.flush()
         return self._tgt_subj
 
+    def _plan_obj(self, obj_kind, obj_val):
+        """
+        Returns the object node described by a kind and value in a compiled plan.
+        """
+        if obj_kind == OBJ_NODE:
+            return obj_val
+        if obj_kind == OBJ_PARAM:
+            return obj_val.resolve(self._params)
+        return self._bnode(obj_val)
+
 
     # Extract / transform methods
     # ---------------------------
@@ -273,6 +799,7 @@ class DataExtractMap(object):
             except EmptySelection:
                 pass # No subject to save
             return
+        set_subj_emf.map_op = ("set_subj", selector, value)
         return set_subj_emf
 
     @classmethod
@@ -285,7 +812,8 @@ class DataExtractMap(object):
             for s, p, o in matches:
                 for stmt in subgraph(self, s, p, o):
                     # print("@@@ emit stmt %s"%(stmt,))
-                    self._tgt.add(stmt)
+                    self._emit(stmt)
+        emit_emf.map_op = ("emit", selector, subgraph)
         return emit_emf
 
     # Statement selector methods
@@ -296,7 +824,7 @@ class DataExtractMap(object):
         """
         Returns selector that matches all statements.
         """
-        def prop_all_sel(src, base):
+        def prop_all_sel(src, base, mapper):
             # print("@@@ prop_all_sel %r, %s"%(src, base))
             return src.triples((URIRef(base), None, None))
         return prop_all_sel
@@ -306,7 +834,7 @@ class DataExtractMap(object):
         """
         Returns selector for statements whose property is the supplied URI value.
         """
-        def prop_eq_sel(src, base):
+        def prop_eq_sel(src, base, mapper):
             # print("@@@ prop_eq_sel u: %s, b: %r"%(uri, base))
             # print("@@@ triples     %r"%(list( 
             #     src.triples((URIRef(base), URIRef(uri), None))
@@ -320,11 +848,13 @@ class DataExtractMap(object):
         Returns selector for statements whose property is the supplied URI value.
         """
         prop_ref = URIRef(uri)
-        def prop_ne_sel(src, base):
+        def prop_ne_sel(src, base, mapper):
             # print("@@@ prop_ne_sel %s, %r, %s"%(uri, src, base))
-            for s, p, o in src.triples((URIRef(base), None, None)):
+            pred_stmts = get_predicate_index(src).subject_predicates(URIRef(base))
+            for p in pred_stmts:
                 if p != prop_ref:
-                    yield (s, p, o)
+                    for stmt in pred_stmts[p]:
+                        yield stmt
             return
         return prop_ne_sel
 
@@ -333,9 +863,12 @@ class DataExtractMap(object):
         """
         Returns selector for statements whose property starts with the supplied URI value.
         """
-        def prop_nseq_sel(src, base):
-            for stmt in src.triples((URIRef(base), None, None)):
-                if str(stmt[1]).startswith(str(uri)):
+        prefix = str(uri)
+        def prop_nseq_sel(src, base, mapper):
+            index      = get_predicate_index(src)
+            pred_stmts = index.subject_predicates(URIRef(base))
+            for p in index.prefix_predicates(URIRef(base), prefix):
+                for stmt in pred_stmts[p]:
                     yield stmt
             return
         return prop_nseq_sel
@@ -345,10 +878,15 @@ class DataExtractMap(object):
         """
         Returns selector for statements whose property starts with the supplied URI value.
         """
-        def prop_nsne_sel(src, base):
-            for stmt in src.triples((URIRef(base), None, None)):
-                if not str(stmt[1]).startswith(str(uri)):
-                    yield stmt
+        prefix = str(uri)
+        def prop_nsne_sel(src, base, mapper):
+            index      = get_predicate_index(src)
+            pred_stmts = index.subject_predicates(URIRef(base))
+            ns_preds   = index.prefix_predicates(URIRef(base), prefix)
+            for p in pred_stmts:
+                if p not in ns_preds:
+                    for stmt in pred_stmts[p]:
+                        yield stmt
             return
         return prop_nsne_sel
 
@@ -357,11 +895,26 @@ class DataExtractMap(object):
         """
         Returns generator for a single statement with the supplied property and object.
 
-        If no object value is supplied, a blank node is allocated and used.
+        If no object value is supplied, a blank node is allocated and used.  The same 
+        blank node is used for all statements generated by the same selector in a 
+        single use of a mapping table.
+
+        The object value may be a parameter slot (see `param`).
         """
         obj_node = obj      # Assume already presented as RDF node
         if obj is None:
-            obj_node = BNode()
+            bnode_key = object()
+            def stmt_gen_sel(src, base, mapper):
+                yield (base, URIRef(prop_uri), mapper._bnode(bnode_key))
+                return
+            stmt_gen_sel.stmt_gen = (URIRef(prop_uri), OBJ_BNODE, bnode_key)
+            return stmt_gen_sel
+        elif isinstance(obj, MapParam):
+            def stmt_gen_sel(src, base, mapper):
+                yield (base, URIRef(prop_uri), obj.resolve(mapper._params))
+                return
+            stmt_gen_sel.stmt_gen = (URIRef(prop_uri), OBJ_PARAM, obj)
+            return stmt_gen_sel
         elif isinstance(obj, str):
             # Heuristic for kind of graph node
             if obj.startswith("http:") or obj.startswith("https:") or obj.startswith("file:"):
@@ -369,9 +922,10 @@ class DataExtractMap(object):
             else:
                 obj_node = Literal(obj)
         #@@@ obj_node = URIRef(obj) if obj else BNode()
-        def stmt_gen_sel(src, base):
+        def stmt_gen_sel(src, base, mapper):
             yield (base, URIRef(prop_uri), obj_node)
             return
+        stmt_gen_sel.stmt_gen = (URIRef(prop_uri), OBJ_NODE, obj_node)
         return stmt_gen_sel
 
     @classmethod
@@ -380,12 +934,25 @@ class DataExtractMap(object):
         Returns generator for a single statement with the supplied property and 
         URL object vaue.  If the supplied object value is None, no statement is generated.
         """
-        def stmt_gen_sel(src, base):
+        def stmt_gen_sel(src, base, mapper):
             if isinstance(obj_url, str):
                 yield (base, URIRef(prop_uri), URIRef(obj_url))
             return
         return stmt_gen_sel
 
+    @classmethod
+    def param_values(cls, prop_uri, name):
+        """
+        Returns generator for statements with the supplied property, and each of 
+        the values in a list supplied as the named parameter.
+        """
+        prop_ref = URIRef(prop_uri)
+        def param_values_sel(src, base, mapper):
+            for obj_node in mapper._params[name]:
+                yield (base, prop_ref, obj_node)
+            return
+        return param_values_sel
+
 
     # Result subgraph generator methods
     # ---------------------------------
@@ -414,6 +981,7 @@ class DataExtractMap(object):
         def gen(self, s, p, o):
             yield (gen_s(self, s, p, o), gen_p(self, s, p, o), gen_o(self, s, p, o))
             return
+        gen.stmt = (gen_s, gen_p, gen_o)
         return gen
 
     @classmethod
@@ -495,9 +1063,19 @@ class DataExtractMap(object):
         subgraph_map
                 a mapping table that drived generation of the emited subgraph.
         """
+        subgraph_plan = cls.get_plan(subgraph_map)
         def loc_subgraph_gen(self, s, p, o):
             # Get copy of graph
             subgraph_node = subgraph_ref(self, s, p, o)
+            subgraph_key  = self._subgraph_key(subgraph_map, subgraph_node, self._src)
+            if subgraph_key in self._memo:
+                # Subgraph already mapped: just link to it
+                if gen_s and gen_p:
+                    yield (
+                        gen_s(self, s, p, o), gen_p(self, s, p, o), 
+                        self._memo[subgraph_key] or subgraph_node
+                        )
+                return
             # Map and emit subgraph
             sub_subgraph_map = DataExtractMap(
                 subgraph_node, 
@@ -505,13 +1083,19 @@ class DataExtractMap(object):
                 self._tgt,
                 ref_src_subj=s, 
                 ref_tgt_subj=self._tgt_subj, 
-                ref_src_obj=o
+                ref_src_obj=o,
+                params=self._params,
+                bnodes=self._bnodes,
+                emit_buffer=self._emit_buffer,
+                memo=self._memo
                 )
-            subgraph_res = sub_subgraph_map.extract_map(subgraph_map)
+            subgraph_res = sub_subgraph_map.run_plan(subgraph_plan)
+            self._memo[subgraph_key] = subgraph_res
             # Link to subgraph (if subject/property supplied)
             if gen_s and gen_p:
                 yield (gen_s(self, s, p, o), gen_p(self, s, p, o), subgraph_res or subgraph_node)
             return
+        loc_subgraph_gen.loc_subgraph = (gen_s, gen_p, subgraph_ref, subgraph_map)
         return loc_subgraph_gen
 
     @classmethod
@@ -537,6 +1121,7 @@ class DataExtractMap(object):
         subgraph_map
                 a mapping table that drived generation of the emited subgraph.
         """
+        subgraph_plan = cls.get_plan(subgraph_map)
         def ref_subgraph_gen(self, s, p, o):
             # Get copy of graph
             subgraph_node = subgraph_ref(self, s, p, o)
@@ -544,6 +1129,14 @@ class DataExtractMap(object):
             print("@@@ subgraph_url %s, link from %s, %s"%(subgraph_url,gen_s(self, s, p, o), gen_p(self, s, p, o)))
             if subgraph_url.startswith("#"):
                 assert false, "@@@@ URL error"
+            subgraph_key  = (id(subgraph_map), subgraph_node)   # Source is subgraph_url
+            if subgraph_key in self._memo:
+                # Subgraph already mapped: just link to it
+                yield (
+                    gen_s(self, s, p, o), gen_p(self, s, p, o), 
+                    self._memo[subgraph_key] or subgraph_node
+                    )
+                return
             subgraph_rdf = Rdf_graph_cache.get_graph(subgraph_url)
             # Map and emit subgraph
             sub_subgraph_map = DataExtractMap(
@@ -552,12 +1145,18 @@ class DataExtractMap(object):
                 self._tgt,
                 ref_src_subj=s, 
                 ref_tgt_subj=self._tgt_subj, 
-                ref_src_obj=o
+                ref_src_obj=o,
+                params=self._params,
+                bnodes=self._bnodes,
+                emit_buffer=self._emit_buffer,
+                memo=self._memo
                 )
-            subgraph_res = sub_subgraph_map.extract_map(subgraph_map)
+            subgraph_res = sub_subgraph_map.run_plan(subgraph_plan)
+            self._memo[subgraph_key] = subgraph_res
             # Link to subgraph
             yield (gen_s(self, s, p, o), gen_p(self, s, p, o), subgraph_res or subgraph_node)
             return
+        ref_subgraph_gen.ref_subgraph = (gen_s, gen_p, subgraph_ref, subgraph_map)
         return ref_subgraph_gen
 
     @classmethod
@@ -607,6 +1206,7 @@ class DataExtractMap(object):
             # Close off new list
             yield (prev_s, prev_p, RDF.nil)
             return
+        ref_list_gen.ref_list = (gen_s, gen_p, list_head, subgraph_map)
         return ref_list_gen
 
     @classmethod
@@ -621,6 +1221,7 @@ class DataExtractMap(object):
             for stmt in alt_gen(self, s, p, o):
                 # print("@@@ emit_alt stmt %s"%(stmt,))
                 yield stmt
+        emit_alt_gen.alt_values = (test_stmt, alt_pass, alt_fail)
         return emit_alt_gen
 
     # Statement test methods
@@ -751,6 +1352,37 @@ class DataExtractMap(object):
             return URIRef(template%{'subj': str(s), 'prop': str(p), 'obj': str(o)})
         return val
 
+    @classmethod
+    def param(cls, name):
+        """
+        Value generator that returns the value of a named parameter supplied 
+        when the mapping table is used.  This may also be used as the object 
+        value of `stmt_gen`.
+
+        NOTE: unlike some other value generators, this is invoked as a function call.
+        """
+        return MapParam(name)
+
+    @classmethod
+    def param_literal(cls, template, datatype=None, lang=None):
+        """
+        Value generator that interpolates parameter values in a template
+        to yield a new literal node.
+
+        Template may contain '%(name)s' to refer to the value of parameter 'name'.
+        """
+        return MapParam(template, lambda v: Literal(v, datatype=datatype, lang=lang))
+
+    @classmethod
+    def param_uri(cls, template):
+        """
+        Value generator that interpolates parameter values in a template
+        to yield a new URI node.
+
+        Template may contain '%(name)s' to refer to the value of parameter 'name'.
+        """
+        return MapParam(template, URIRef)
+
     @classmethod
     def src_obj_or_val(cls, prop):
         """
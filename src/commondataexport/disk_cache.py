@@ -0,0 +1,310 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# disk_cache.py - sharded on-disk cache for retrieved web resources
+#
+# Each cached resource is stored under a name derived from a SHA-1 hash of its
+# URL and format, in a two-level fan-out of subdirectories, so that no single
+# directory grows too large and lookups do not depend on directory size.  An
+# append-only index file records the URL and format for each hashed entry.
+#
+# A second tier holds parsed RDF data (namespace bindings and triples) in
+# pickled form, keyed by a hash of the source text from which it was parsed,
+# so that unchanged resources do not need to be parsed again.
+#
+# HTTP response validators (ETag and Last-Modified) are saved with each entry,
+# so that, when revalidation is selected, a cached resource can be checked
+# using a conditional request rather than being retrieved again in full.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import os
+import os.path
+import errno
+import json
+import hashlib
+import logging
+import threading
+
+try:
+    import cPickle as pickle    # Python 2
+except ImportError:
+    import pickle               # Python 3
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+CACHE_DIR_ENV       = "EMPLACES_CACHE_DIR"
+DEFAULT_CACHE_DIR   = os.path.join(os.path.expanduser("~"), ".emplaces", "rdf_data_cache")
+LEGACY_CACHE_DIR    = "_rdf_data_cache"     # Relative to current directory
+CACHE_INDEX_FILE    = "index.txt"
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def make_dirs(dir_path):
+    """
+    Create directory and any missing parent directories, if not already present.
+    """
+    try:
+        os.makedirs(dir_path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return
+
+def write_file_atomic(file_path, data):
+    """
+    Write byte string data to a file, such that concurrent readers (including
+    other processes) never see a partially written file.
+    """
+    tmp_path = "%s.%d.%d.tmp"%(file_path, os.getpid(), threading.current_thread().ident)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.rename(tmp_path, file_path)
+    return
+
+#   ===================================================================
+#
+#   Disk cache class
+#
+#   ===================================================================
+
+class DiskCache(object):
+    """
+    On-disk cache of web resource text, keyed by URL and format.
+    """
+
+    def __init__(self, cache_root, legacy_root=None, revalidate=False):
+        """
+        cache_root  is the root directory of the cache, which is created if needed.
+        legacy_root if specified, is a directory containing a cache in the form used
+                    by earlier versions of this software (one file per resource in
+                    a single directory per format).  Entries found there are copied
+                    into the new cache when first accessed.
+        revalidate  if True, indicates that cached entries are to be revalidated
+                    with the originating server the first time they are used by 
+                    this process (see `needs_revalidation`).
+        """
+        self._cache_root  = cache_root
+        self._legacy_root = legacy_root
+        self._revalidate  = revalidate
+        self._revalidated = set()
+        self._index_lock  = threading.Lock()
+        self._reval_lock  = threading.Lock()
+        make_dirs(cache_root)
+        return
+
+    def cache_root(self):
+        return self._cache_root
+
+    def entry_key(self, url, format):
+        """
+        Returns the hash key used for a resource URL and format.
+        """
+        return hashlib.sha1(("%s %s"%(format, url)).encode("utf-8")).hexdigest()
+
+    def entry_path(self, key, suffix=".txt"):
+        """
+        Returns the name of the file used to store cache entry data.
+
+        The first two pairs of hex digits of the key select the fan-out
+        subdirectories.
+        """
+        return os.path.join(self._cache_root, key[0:2], key[2:4], key+suffix)
+
+    def get(self, url, format):
+        """
+        Returns cached text for the indicated URL and format, or None.
+        """
+        entry_file = self.entry_path(self.entry_key(url, format))
+        if not os.path.exists(entry_file):
+            return self._get_legacy(url, format)
+        with open(entry_file, "rb") as f:
+            text = f.read().decode("utf-8")
+        return text
+
+    def put(self, url, format, text, meta=None):
+        """
+        Saves text for the indicated URL and format.
+
+        meta    if specified, is a dictionary of response validators to be saved
+                with the text (see `get_meta`).  Otherwise, any validators 
+                previously saved are discarded.
+        """
+        key        = self.entry_key(url, format)
+        entry_file = self.entry_path(key)
+        is_new     = not os.path.exists(entry_file)
+        make_dirs(os.path.dirname(entry_file))
+        write_file_atomic(entry_file, text.encode("utf-8"))
+        self.put_meta(url, format, meta or {})
+        if is_new:
+            self._add_index_entry(key, url, format)
+        return
+
+    def get_meta(self, url, format):
+        """
+        Returns a dictionary of response validators saved for the indicated 
+        URL and format (e.g. {"etag": ..., "last_modified": ...}).  If none
+        have been saved, an empty dictionary is returned.
+        """
+        meta_file = self.entry_path(self.entry_key(url, format), suffix=".meta")
+        if not os.path.exists(meta_file):
+            return {}
+        try:
+            with open(meta_file, "rb") as f:
+                return json.loads(f.read().decode("utf-8"))
+        except ValueError as e:
+            log.warning("Unreadable cache metadata %s (%s)"%(meta_file, e))
+        return {}
+
+    def put_meta(self, url, format, meta):
+        """
+        Saves a dictionary of response validators for the indicated URL and format.
+        """
+        meta_file = self.entry_path(self.entry_key(url, format), suffix=".meta")
+        make_dirs(os.path.dirname(meta_file))
+        write_file_atomic(meta_file, json.dumps(meta, sort_keys=True).encode("utf-8"))
+        return
+
+    def needs_revalidation(self, url, format):
+        """
+        Returns True if the cached entry for the indicated URL and format is 
+        to be revalidated with the originating server.  When revalidation is 
+        selected, this returns True just once for each entry, so that each 
+        resource is checked at most once by any run of the program.
+        """
+        if not self._revalidate:
+            return False
+        key = self.entry_key(url, format)
+        with self._reval_lock:
+            if key in self._revalidated:
+                return False
+            self._revalidated.add(key)
+        return True
+
+    def parsed_key(self, text, format):
+        """
+        Returns the key used for parsed data, which is a hash of the 
+        source text and the format in which it is parsed.
+        """
+        text_hash = hashlib.sha1(format.encode("utf-8"))
+        text_hash.update(text.encode("utf-8"))
+        return text_hash.hexdigest()
+
+    def get_parsed(self, parsed_key):
+        """
+        Returns previously saved parsed data for the indicated key, or None.
+        """
+        entry_file = self.entry_path(parsed_key, suffix=".pickle")
+        if not os.path.exists(entry_file):
+            return None
+        try:
+            with open(entry_file, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            log.warning("Unreadable parsed data %s (%s)"%(entry_file, e))
+        return None
+
+    def put_parsed(self, parsed_key, parsed_data):
+        """
+        Saves parsed data for the indicated key.  The data may be any
+        picklable value.
+        """
+        entry_file = self.entry_path(parsed_key, suffix=".pickle")
+        make_dirs(os.path.dirname(entry_file))
+        write_file_atomic(entry_file, pickle.dumps(parsed_data, pickle.HIGHEST_PROTOCOL))
+        return
+
+    def iter_index(self):
+        """
+        Iterates over (key, format, url) tuples for cache entries that have
+        been recorded in the index.
+        """
+        index_file = os.path.join(self._cache_root, CACHE_INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file, "rb") as f:
+                for line in f:
+                    fields = line.decode("utf-8").rstrip("\n").split("\t", 2)
+                    if len(fields) == 3:
+                        yield tuple(fields)
+        return
+
+    def _add_index_entry(self, key, url, format):
+        """
+        Append an entry to the index file.  Each entry is written in a single
+        call on a file opened for appending, so that concurrent processes can
+        safely share the index.
+        """
+        index_file = os.path.join(self._cache_root, CACHE_INDEX_FILE)
+        line = ("%s\t%s\t%s\n"%(key, format, url)).encode("utf-8")
+        with self._index_lock:
+            with open(index_file, "ab") as f:
+                f.write(line)
+        return
+
+    def _get_legacy(self, url, format):
+        """
+        Look for an entry in a cache using the legacy layout, and if found
+        copy it to this cache and return its text.  Otherwise, return None.
+        """
+        if not self._legacy_root or "://" not in url:
+            return None
+        legacy_key  = url.split("://", 1)[1].replace("/", ".")
+        legacy_file = os.path.join(self._legacy_root, format, legacy_key)
+        if not os.path.exists(legacy_file):
+            return None
+        log.debug("DiskCache._get_legacy: %s"%(legacy_file,))
+        with open(legacy_file, "rb") as f:
+            text = f.read().decode("utf-8")
+        self.put(url, format, text)
+        return text
+
+#   ===================================================================
+#
+#   Currently selected disk cache
+#
+#   ===================================================================
+
+_disk_cache      = None
+_disk_cache_lock = threading.Lock()
+
+def set_disk_cache_dir(cache_root, revalidate=False):
+    """
+    Select the root directory of the disk cache used for retrieved resources,
+    and whether cached resources are revalidated when first used.
+    """
+    global _disk_cache
+    with _disk_cache_lock:
+        _disk_cache = DiskCache(
+            cache_root,
+            legacy_root=os.path.join(os.getcwd(), LEGACY_CACHE_DIR),
+            revalidate=revalidate
+            )
+    return _disk_cache
+
+def get_disk_cache():
+    """
+    Returns the disk cache for retrieved resources.  If not previously selected,
+    a cache at the directory named by environment variable EMPLACES_CACHE_DIR,
+    or at DEFAULT_CACHE_DIR, is used.
+    """
+    if _disk_cache is None:
+        set_disk_cache_dir(os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR)
+    return _disk_cache
+
+# End.
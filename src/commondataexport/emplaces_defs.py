@@ -64,6 +64,7 @@ EMC       = Namespace("http://id.emplaces.info/calendar/")
 PLACE     = Namespace("http://id.emplaces.info/place/")
 AGENT     = Namespace("http://id.emplaces.info/agent/")
 REF       = Namespace("http://id.emplaces.info/reference/")
+GENID     = Namespace("http://id.emplaces.info/.well-known/genid/")  # Skolem IRIs
 
 # Added for prosopographical work...
 PERSON               = Namespace("http://id.emplaces.info/person/")
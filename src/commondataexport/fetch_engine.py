@@ -0,0 +1,221 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# fetch_engine.py - engines for running many data fetches concurrently
+#
+# A fetch engine applies a supplied fetch function to each of a list of items
+# (usually URLs), and returns the results in input order.  Bulk commands use
+# the currently configured engine so that the degree of concurrency can be
+# selected from the command line without changing the fetch logic.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import logging
+import threading
+import urlparse
+import collections
+
+from multiprocessing.pool import ThreadPool
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+#   Default limits on the number of requests in flight to each host
+
+HOST_CONCURRENCY_LIMITS = (
+    { "sws.geonames.org":       8
+    , "www.wikidata.org":       8
+    , "query.wikidata.org":     4
+    , "en.wikipedia.org":       8
+    , "localhost:8000":         4       # Annalist (see COLLECTION_BASE)
+    })
+
+DEFAULT_HOST_LIMIT = 4
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def url_host(url):
+    """
+    Returns the host (and port, if given) of the supplied URL.
+    """
+    return urlparse.urlsplit(url).netloc
+
+def parse_host_limits(host_limit_strs):
+    """
+    Parse a list of "HOST=N" strings (e.g. from the command line),
+    and return a dictionary of per-host concurrency limits.
+    """
+    host_limits = {}
+    for hl in host_limit_strs or []:
+        host, limit = hl.rsplit("=", 1)
+        host_limits[host.strip()] = int(limit)
+    return host_limits
+
+def call_fetch(fetch_fn, item):
+    """
+    Calls the supplied fetch function for an item, and returns a tuple
+    (item, result, exception), where exactly one of result and exception
+    is None.
+    """
+    try:
+        return (item, fetch_fn(item), None)
+    except Exception as e:
+        log.debug("call_fetch: %s failed"%(item,), exc_info=True)
+        return (item, None, e)
+
+#   ===================================================================
+#
+#   Fetch engine classes
+#
+#   ===================================================================
+
+class SerialFetchEngine(object):
+    """
+    Fetch engine that processes each item in turn, on the calling thread.
+    """
+
+    concurrent      = False
+    max_concurrency = 1
+
+    def map(self, fetch_fn, items, item_host=url_host):
+        """
+        Apply `fetch_fn` to each of the supplied items, returning a list of
+        (item, result, exception) tuples in the same order as the items.
+
+        `item_host` is accepted for compatibility with other engines, and ignored.
+        """
+        return [ call_fetch(fetch_fn, item) for item in items ]
+
+class ThreadPoolFetchEngine(object):
+    """
+    Fetch engine that processes items using a fixed-size pool of threads.
+    """
+
+    concurrent = True
+
+    def __init__(self, num_threads):
+        self.max_concurrency = num_threads
+        return
+
+    def map(self, fetch_fn, items, item_host=url_host):
+        """
+        Apply `fetch_fn` to each of the supplied items, returning a list of
+        (item, result, exception) tuples in the same order as the items.
+
+        `item_host` is accepted for compatibility with other engines, and ignored.
+        """
+        if not items:
+            return []
+        pool = ThreadPool(min(self.max_concurrency, len(items)))
+        try:
+            results = pool.map(lambda item: call_fetch(fetch_fn, item), items, 1)
+        finally:
+            pool.close()
+            pool.join()
+        return results
+
+class HostLimitedFetchEngine(object):
+    """
+    Fetch engine that enforces a separate concurrency limit for each host.
+
+    Items are grouped by host, and each group is served by a number of worker
+    threads no greater than that host's limit.  Thus the number of threads used
+    depends on the hosts accessed and their limits, not on the number of items,
+    and a slow or throttled service does not hold up requests to other hosts.
+    """
+
+    concurrent = True
+
+    def __init__(self, host_limits=None, default_limit=DEFAULT_HOST_LIMIT):
+        """
+        host_limits
+                is a dictionary of per-host concurrency limits, which override
+                the defaults in HOST_CONCURRENCY_LIMITS.
+        default_limit
+                is the concurrency limit for hosts not otherwise mentioned.
+        """
+        self._host_limits   = dict(HOST_CONCURRENCY_LIMITS)
+        self._host_limits.update(host_limits or {})
+        self._default_limit = default_limit
+        self.max_concurrency = max([default_limit] + list(self._host_limits.values()))
+        return
+
+    def host_limit(self, host):
+        """
+        Returns the concurrency limit for the indicated host.
+        """
+        return self._host_limits.get(host, self._default_limit)
+
+    def map(self, fetch_fn, items, item_host=url_host):
+        """
+        Apply `fetch_fn` to each of the supplied items, returning a list of
+        (item, result, exception) tuples in the same order as the items.
+
+        `item_host` is a function that returns the host accessed for an item;
+        by default, items are assumed to be URLs.
+        """
+        results     = [None] * len(items)
+        host_queues = collections.OrderedDict()
+        for index, item in enumerate(items):
+            host_queues.setdefault(item_host(item), collections.deque()).append(index)
+        def host_worker(queue):
+            while True:
+                try:
+                    index = queue.popleft()
+                except IndexError:
+                    return
+                results[index] = call_fetch(fetch_fn, items[index])
+        workers = []
+        for host, queue in host_queues.items():
+            num_workers = min(self.host_limit(host), len(queue))
+            log.debug(
+                "HostLimitedFetchEngine.map: %s, %d items, %d workers"%
+                (host, len(queue), num_workers)
+                )
+            for _ in range(num_workers):
+                worker = threading.Thread(target=host_worker, args=(queue,))
+                worker.daemon = True
+                worker.start()
+                workers.append(worker)
+        for worker in workers:
+            worker.join()
+        return results
+
+#   ===================================================================
+#
+#   Currently selected fetch engine
+#
+#   ===================================================================
+
+_fetch_engine = SerialFetchEngine()
+
+def set_fetch_engine(engine):
+    """
+    Select the fetch engine used by bulk operations.
+    """
+    global _fetch_engine
+    _fetch_engine = engine
+    return
+
+def get_fetch_engine():
+    """
+    Returns the currently selected fetch engine.
+    """
+    return _fetch_engine
+
+# End.
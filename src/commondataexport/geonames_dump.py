@@ -0,0 +1,498 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# geonames_dump.py - GeoNames place data from local GeoNames dump files
+#
+# Builds graphs of GeoNames place data equivalent to the "about.rdf" data
+# served by sws.geonames.org, using the tab-separated dump files published at
+# http://download.geonames.org/export/dump/:
+#
+#   allCountries.txt        main place records
+#   alternateNamesV2.txt    alternate names and links
+#   hierarchy.txt           parent-child relationships
+#   countryInfo.txt         country data, including country place ids
+#
+# The dump files are large, so rather than being loaded into memory, they are
+# accessed using binary indexes that are built on first use.  Each index is a
+# sorted array of 64-bit entries, each combining a GeoNames id with the offset
+# of a record for that id in the dump file, which is memory-mapped and searched
+# by bisection.  Thus a place record is located in O(log n) time, and memory use
+# is largely independent of the size of the dump.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import os
+import os.path
+import re
+import mmap
+import array
+import heapq
+import struct
+import logging
+import threading
+
+try:
+    import cPickle as pickle    # Python 2
+except ImportError:
+    import pickle               # Python 3
+
+from rdflib         import Graph, URIRef, Literal, RDF, RDFS
+
+from emplaces_defs  import GN, GEONAMES, WGS84_POS
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+ALL_COUNTRIES_FILE   = "allCountries.txt"
+ALTERNATE_NAMES_FILE = "alternateNamesV2.txt"
+HIERARCHY_FILE       = "hierarchy.txt"
+COUNTRY_INFO_FILE    = "countryInfo.txt"
+
+#   Fields of allCountries.txt
+
+GN_ID           = 0
+GN_NAME         = 1
+GN_ASCIINAME    = 2
+GN_LAT          = 4
+GN_LONG         = 5
+GN_FCLASS       = 6
+GN_FCODE        = 7
+GN_COUNTRY      = 8
+GN_ADMIN1       = 10     # Admin codes for level N are in field GN_ADMIN1+N-1
+GN_POPULATION   = 14
+GN_FIELDS       = 19
+
+#   Fields of alternateNamesV2.txt
+
+AN_GEONAMEID    = 1
+AN_LANG         = 2
+AN_NAME         = 3
+AN_PREFERRED    = 4
+AN_SHORT        = 5
+
+#   Fields of hierarchy.txt
+
+HI_PARENT       = 0
+HI_CHILD        = 1
+HI_TYPE         = 2
+
+#   Fields of countryInfo.txt
+
+CI_ISO          = 0
+CI_GEONAMEID    = 16
+
+#   Feature codes of administrative divisions, and their levels
+
+ADMIN_LEVELS = (
+    { "ADM1":   1
+    , "ADM2":   2
+    , "ADM3":   3
+    , "ADM4":   4
+    })
+
+#   Index files, which are created alongside the dump files
+
+INDEX_SUFFIX       = ".idx"
+ADMIN_INDEX_SUFFIX = ".admin"
+
+#   Index file layout: header (magic, dump file size, dump file mtime, number of
+#   entries), followed by entries of the form (geonames_id << INDEX_ID_SHIFT) | offset,
+#   in ascending order.
+
+INDEX_MAGIC       = b"GNIDX001"
+INDEX_HEADER      = struct.Struct(str("=8sQQQ"))
+INDEX_ENTRY       = struct.Struct(str("=Q"))
+INDEX_ID_SHIFT    = 36                          # Allows dump files up to 64GB
+INDEX_OFFSET_MASK = (1 << INDEX_ID_SHIFT) - 1
+INDEX_CHUNK_SIZE  = 1000000                     # Entries sorted in memory at once
+
+#   Pseudo-language codes used in alternateNamesV2.txt for values that are not names
+
+NON_NAME_LANGUAGES = set(
+    [ "link", "post", "iata", "icao", "faac", "abbr", "fr_1793", "tcid"
+    , "unlc", "wkdt", "phon", "piny"
+    ])
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def read_dump_fields(dump_file, max_split=-1):
+    """
+    Iterates over the records of a GeoNames dump file, yielding for each
+    a list of byte string fields.  Comment lines are skipped.
+    """
+    with open(dump_file, "rb") as f:
+        for line in f:
+            if line.startswith(b"#"):
+                continue
+            yield line.rstrip(b"\r\n").split(b"\t", max_split)
+
+def decode_fields(fields):
+    return [ f.decode("utf-8") for f in fields ]
+
+def map_slug(name):
+    """
+    Returns the name slug used in GeoNames location map URLs.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def dump_file_stamp(dump_file):
+    """
+    Returns a (size, mtime) tuple used to detect changes to a dump file 
+    since an index was built.
+    """
+    st = os.stat(dump_file)
+    return (st.st_size, int(st.st_mtime))
+
+def uint64_array():
+    """
+    Returns a new empty array of unsigned 64-bit integers.
+    """
+    for typecode in ("L", "Q"):
+        try:
+            a = array.array(str(typecode))
+        except ValueError:
+            continue
+        if a.itemsize == 8:
+            return a
+    raise ValueError("No 64-bit unsigned array type available")
+
+#   ===================================================================
+#
+#   Dump file index class
+#
+#   ===================================================================
+
+class GeoNamesDumpIndex(object):
+    """
+    Memory-mapped index of the records in a GeoNames dump file, keyed by 
+    GeoNames id.  An id may have any number of records (e.g. alternate names).
+    """
+
+    def __init__(self, dump_file, id_field):
+        """
+        dump_file   is the name of the dump file to be indexed.
+        id_field    is the index of the GeoNames id field in each record.
+        """
+        self._dump_file  = dump_file
+        self._index_file = dump_file + INDEX_SUFFIX
+        self._id_field   = id_field
+        self._dump_map   = None
+        self._index_map  = None
+        self._count      = 0
+        return
+
+    def open(self):
+        """
+        Open the index, building it first if it is missing or out of date.
+        """
+        if self._index_map is not None:
+            return
+        size, mtime = dump_file_stamp(self._dump_file)
+        header = None
+        if os.path.exists(self._index_file):
+            with open(self._index_file, "rb") as f:
+                header = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if header is None or header[0:3] != (INDEX_MAGIC, size, mtime):
+            self.build()
+        with open(self._index_file, "rb") as f:
+            self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = INDEX_HEADER.unpack_from(self._index_map, 0)[3]
+        if size > 0:
+            with open(self._dump_file, "rb") as f:
+                self._dump_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return
+
+    def build(self):
+        """
+        Build the index file.  Entries are sorted in chunks, which are then merged
+        as they are written, so that the whole index is never held in a list.
+        """
+        log.info("GeoNamesDumpIndex: building %s"%(self._index_file,))
+        size, mtime = dump_file_stamp(self._dump_file)
+        chunks = []
+        keys   = []
+        offset = 0
+        with open(self._dump_file, "rb") as f:
+            for line in f:
+                if not line.startswith(b"#"):
+                    place_id = int(line.split(b"\t", self._id_field+1)[self._id_field])
+                    keys.append((place_id << INDEX_ID_SHIFT) | offset)
+                    if len(keys) >= INDEX_CHUNK_SIZE:
+                        chunks.append(self._sorted_chunk(keys))
+                        keys = []
+                offset += len(line)
+        if keys:
+            chunks.append(self._sorted_chunk(keys))
+        count    = sum(len(c) for c in chunks)
+        tmp_file = "%s.%d.tmp"%(self._index_file, os.getpid())
+        with open(tmp_file, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime, count))
+            entries = uint64_array()
+            for key in heapq.merge(*chunks):
+                entries.append(key)
+                if len(entries) >= INDEX_CHUNK_SIZE:
+                    entries.tofile(f)
+                    entries = uint64_array()
+            entries.tofile(f)
+        os.rename(tmp_file, self._index_file)
+        return
+
+    def _sorted_chunk(self, keys):
+        keys.sort()
+        chunk = uint64_array()
+        chunk.extend(keys)
+        return chunk
+
+    def _entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._index_map, INDEX_HEADER.size+i*INDEX_ENTRY.size)[0]
+
+    def lookup(self, geonames_id):
+        """
+        Returns a list of records (each a list of byte string fields) for the
+        indicated GeoNames id.
+        """
+        self.open()
+        place_id = int(geonames_id)
+        # Binary search for first entry for place_id
+        lo, hi = 0, self._count
+        key    = place_id << INDEX_ID_SHIFT
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        records = []
+        while lo < self._count:
+            entry = self._entry(lo)
+            if (entry >> INDEX_ID_SHIFT) != place_id:
+                break
+            start = entry & INDEX_OFFSET_MASK
+            end   = self._dump_map.find(b"\n", start)
+            if end < 0:
+                end = len(self._dump_map)
+            records.append(self._dump_map[start:end].rstrip(b"\r").split(b"\t"))
+            lo += 1
+        return records
+
+#   ===================================================================
+#
+#   GeoNames dump class
+#
+#   ===================================================================
+
+class GeoNamesDump(object):
+    """
+    Provides GeoNames place data from a directory of GeoNames dump files.
+    """
+
+    def __init__(self, dump_dir):
+        self._dump_dir     = dump_dir
+        self._places       = GeoNamesDumpIndex(self.dump_file(ALL_COUNTRIES_FILE), GN_ID)
+        self._alt_names    = GeoNamesDumpIndex(self.dump_file(ALTERNATE_NAMES_FILE), AN_GEONAMEID)
+        self._country_ids  = None   # country code -> geonames_id
+        self._hier_parents = None   # geonames_id -> parent geonames_id
+        self._admin_ids    = None   # (country, admin1, ...) -> geonames_id
+        self._lock         = threading.Lock()
+        return
+
+    def dump_file(self, file_name):
+        return os.path.join(self._dump_dir, file_name)
+
+    def _load_country_info(self):
+        self._country_ids = {}
+        for fields in read_dump_fields(self.dump_file(COUNTRY_INFO_FILE)):
+            if len(fields) > CI_GEONAMEID and fields[CI_GEONAMEID]:
+                self._country_ids[fields[CI_ISO].decode("utf-8")] = (
+                    fields[CI_GEONAMEID].decode("utf-8")
+                    )
+        return
+
+    def _load_hierarchy(self):
+        """
+        Load administrative parent-child relationships.  Where a place has
+        several administrative parents, the first listed is used.
+        """
+        self._hier_parents = {}
+        for fields in read_dump_fields(self.dump_file(HIERARCHY_FILE)):
+            if len(fields) > HI_TYPE and fields[HI_TYPE] == b"ADM":
+                child_id = fields[HI_CHILD].decode("utf-8")
+                if child_id not in self._hier_parents:
+                    self._hier_parents[child_id] = fields[HI_PARENT].decode("utf-8")
+        return
+
+    def _load_admin_ids(self):
+        """
+        Load the index of administrative division codes.  This is built by 
+        scanning allCountries.txt, and saved with the dump index files.
+        """
+        dump_file  = self.dump_file(ALL_COUNTRIES_FILE)
+        admin_file = dump_file + ADMIN_INDEX_SUFFIX
+        stamp      = dump_file_stamp(dump_file)
+        if os.path.exists(admin_file):
+            with open(admin_file, "rb") as f:
+                admin_stamp, admin_ids = pickle.load(f)
+            if admin_stamp == stamp:
+                self._admin_ids = admin_ids
+                return
+        log.info("GeoNamesDump: building %s"%(admin_file,))
+        admin_ids = {}
+        for fields in read_dump_fields(dump_file, GN_FIELDS):
+            level = ADMIN_LEVELS.get(fields[GN_FCODE].decode("utf-8"))
+            if level:
+                admin_key = tuple(
+                    decode_fields(fields[GN_COUNTRY:GN_COUNTRY+1]+fields[GN_ADMIN1:GN_ADMIN1+level])
+                    )
+                admin_ids.setdefault(admin_key, fields[GN_ID].decode("utf-8"))
+        tmp_file = "%s.%d.tmp"%(admin_file, os.getpid())
+        with open(tmp_file, "wb") as f:
+            pickle.dump((stamp, admin_ids), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, admin_file)
+        self._admin_ids = admin_ids
+        return
+
+    def open(self):
+        """
+        Load the small tables used for parent lookups, and open the dump file 
+        indexes, building them if needed.
+        """
+        with self._lock:
+            if self._country_ids is None:
+                self._load_country_info()
+                self._load_hierarchy()
+                self._load_admin_ids()
+                self._places.open()
+                self._alt_names.open()
+        return
+
+    def preload(self, geonames_ids):
+        """
+        Prepare to read data for the supplied GeoNames place ids.
+
+        Records are located using the dump file indexes as they are needed, so 
+        this just ensures that the indexes are available before any places are
+        processed.
+        """
+        self.open()
+        return
+
+    def _place_record(self, geonames_id):
+        """
+        Returns the allCountries.txt record for the indicated place, or None.
+        """
+        records = self._places.lookup(geonames_id)
+        if not records:
+            return None
+        return decode_fields(records[0])
+
+    def _parent_ids(self, place_id, record):
+        """
+        Returns a dictionary of parent place ids for the indicated place,
+        keyed by GeoNames ontology property.
+        """
+        parents   = {}
+        parent_id = None
+        country   = record[GN_COUNTRY]
+        if self._country_ids.get(country, place_id) != place_id:
+            parent_id = self._country_ids[country]
+            parents[GN.parentCountry] = parent_id
+        for level in range(1, 5):
+            admin_codes = record[GN_ADMIN1:GN_ADMIN1+level]
+            if not all(admin_codes) or len(admin_codes) < level:
+                break
+            admin_id = self._admin_ids.get(tuple([country]+admin_codes))
+            if admin_id and admin_id != place_id:
+                parent_id = admin_id
+                parents[GN["parentADM%d"%level]] = admin_id
+        parent_id = self._hier_parents.get(place_id, parent_id)
+        if parent_id:
+            parents[GN.parentFeature] = parent_id
+        return parents
+
+    def get_place_graph(self, geonames_id):
+        """
+        Returns a graph of GeoNames data for the indicated place, in the
+        same form as the "about.rdf" data provided by sws.geonames.org.
+        """
+        self.open()
+        record = self._place_record(geonames_id)
+        if record is None:
+            raise ValueError("GeoNames Id %s not found in dump"%(geonames_id,))
+        alt_names = [ decode_fields(an) for an in self._alt_names.lookup(geonames_id) ]
+        parents   = self._parent_ids(geonames_id, record)
+        place_node = URIRef(GEONAMES["%s/"%(geonames_id,)])
+        g = Graph()
+        g.bind("gn",        GN)
+        g.bind("wgs84_pos", WGS84_POS)
+        g.add((place_node, RDF.type,          GN.Feature))
+        g.add((place_node, RDFS.isDefinedBy,  URIRef(GEONAMES["%s/about.rdf"%(geonames_id,)])))
+        g.add((place_node, GN.name,           Literal(record[GN_NAME])))
+        for an in alt_names:
+            lang = an[AN_LANG]
+            name = an[AN_NAME]
+            if lang == "link":
+                if "wikipedia.org/" in name:
+                    g.add((place_node, GN.wikipediaArticle, URIRef(name)))
+                    if "//en.wikipedia.org/wiki/" in name:
+                        dbpedia_ref = "http://dbpedia.org/resource/" + name.split("/wiki/", 1)[1]
+                        g.add((place_node, RDFS.seeAlso, URIRef(dbpedia_ref)))
+            elif lang not in NON_NAME_LANGUAGES:
+                if len(an) > AN_PREFERRED and an[AN_PREFERRED] == "1":
+                    name_prop = GN.officialName
+                elif len(an) > AN_SHORT and an[AN_SHORT] == "1":
+                    name_prop = GN.shortName
+                else:
+                    name_prop = GN.alternateName
+                g.add((place_node, name_prop, Literal(name, lang=lang or None)))
+        g.add((place_node, GN.featureClass,   GN[record[GN_FCLASS]]))
+        g.add((place_node, GN.featureCode,    GN["%s.%s"%(record[GN_FCLASS], record[GN_FCODE])]))
+        g.add((place_node, GN.countryCode,    Literal(record[GN_COUNTRY])))
+        if record[GN_POPULATION] not in ("", "0"):
+            g.add((place_node, GN.population, Literal(record[GN_POPULATION])))
+        g.add((place_node, WGS84_POS.lat,     Literal(record[GN_LAT])))
+        g.add((place_node, WGS84_POS.long,    Literal(record[GN_LONG])))
+        for parent_prop, parent_id in parents.items():
+            g.add((place_node, parent_prop,   URIRef(GEONAMES["%s/"%(parent_id,)])))
+        map_url = "http://www.geonames.org/%s/%s.html"%(geonames_id, map_slug(record[GN_ASCIINAME]))
+        g.add((place_node, GN.locationMap,    URIRef(map_url)))
+        return g
+
+#   ===================================================================
+#
+#   Currently selected GeoNames dump
+#
+#   ===================================================================
+
+_geonames_dump = None
+
+def set_geonames_dump(dump):
+    """
+    Select a GeoNames dump to be used in place of sws.geonames.org,
+    or None to use sws.geonames.org.
+    """
+    global _geonames_dump
+    _geonames_dump = dump
+    return
+
+def get_geonames_dump():
+    """
+    Returns the currently selected GeoNames dump, or None.
+    """
+    return _geonames_dump
+
+# End.
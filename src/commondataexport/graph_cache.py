@@ -0,0 +1,192 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# graph_cache.py - bounded in-memory cache of parsed RDF graphs
+#
+# Graphs are retained in least-recently-used order, and the least recently
+# used graphs are discarded when a limit on the number of graphs, or on the
+# total number of triples they contain, is exceeded.  Discarded graphs can
+# generally be reloaded cheaply from the disk cache (see `disk_cache`).
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import logging
+import threading
+import weakref
+import collections
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+DEFAULT_MAX_ENTRIES = 1000      # Maximum number of graphs retained
+DEFAULT_MAX_TRIPLES = None      # Maximum number of triples retained (None: no limit)
+
+#   ===================================================================
+#
+#   LRU graph cache class
+#
+#   ===================================================================
+
+class LRUGraphCache(object):
+    """
+    In-memory cache of graphs, keyed by URL (or any other hashable value),
+    with a bounded size and least-recently-used replacement.
+
+    Counts of cache hits, misses and evictions are maintained for reporting
+    (see `stats`).
+    """
+
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES, max_triples=DEFAULT_MAX_TRIPLES):
+        """
+        name        is a name for the cache, used when reporting statistics.
+        max_entries is the maximum number of graphs retained, or None.
+        max_triples is the maximum total number of triples in the graphs
+                    retained, or None.  The most recently used graph is always
+                    retained, even if it alone exceeds this limit.
+        """
+        self._name        = name
+        self._max_entries = max_entries
+        self._max_triples = max_triples
+        self._entries     = collections.OrderedDict()   # key -> (graph, size)
+        self._triples     = 0
+        self._hits        = 0
+        self._misses      = 0
+        self._evictions   = 0
+        self._lock        = threading.Lock()
+        _graph_caches.add(self)
+        return
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def set_limits(self, max_entries=None, max_triples=None):
+        """
+        Set new limits for the cache, evicting graphs as needed.
+        """
+        with self._lock:
+            self._max_entries = max_entries
+            self._max_triples = max_triples
+            self._evict()
+        return
+
+    def get(self, key):
+        """
+        Returns the graph cached for the indicated key, or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries[key] = entry      # Re-insert as most recently used
+            self._hits += 1
+        return entry[0]
+
+    def put(self, key, graph):
+        """
+        Add a graph to the cache, evicting older graphs as needed.
+        """
+        size = len(graph)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._triples -= old_entry[1]
+            self._entries[key] = (graph, size)
+            self._triples += size
+            self._evict()
+        return
+
+    def get_or_load(self, key, load_fn):
+        """
+        Returns the graph cached for the indicated key.  If none is present,
+        `load_fn(key)` is called to obtain the graph, which is added to the cache.
+        """
+        graph = self.get(key)
+        if graph is None:
+            graph = load_fn(key)
+            self.put(key, graph)
+        return graph
+
+    def _evict(self):
+        """
+        Discard least recently used graphs while a limit is exceeded.
+        Must be called with the cache lock held.
+        """
+        while len(self._entries) > 1:
+            too_many = (
+                (self._max_entries is not None) and
+                (len(self._entries) > self._max_entries)
+                )
+            too_big = (
+                (self._max_triples is not None) and
+                (self._triples > self._max_triples)
+                )
+            if not (too_many or too_big):
+                break
+            key, (graph, size) = self._entries.popitem(last=False)
+            self._triples   -= size
+            self._evictions += 1
+            log.debug("LRUGraphCache._evict: %s, %s"%(self._name, key))
+        return
+
+    def stats(self):
+        """
+        Returns a dictionary of cache statistics.
+        """
+        return (
+            { "name":       self._name
+            , "entries":    len(self._entries)
+            , "triples":    self._triples
+            , "hits":       self._hits
+            , "misses":     self._misses
+            , "evictions":  self._evictions
+            })
+
+    def log_stats(self):
+        log.info(
+            "%(name)s: %(entries)d graphs (%(triples)d triples), "
+            "%(hits)d hits, %(misses)d misses, %(evictions)d evictions"%
+            self.stats()
+            )
+        return
+
+#   ===================================================================
+#
+#   Settings applied to all graph caches
+#
+#   ===================================================================
+
+_graph_caches = weakref.WeakSet()
+
+def set_graph_cache_limits(max_entries=DEFAULT_MAX_ENTRIES, max_triples=DEFAULT_MAX_TRIPLES):
+    """
+    Set limits for all graph caches.
+    """
+    for cache in list(_graph_caches):
+        cache.set_limits(max_entries=max_entries, max_triples=max_triples)
+    return
+
+def log_graph_cache_stats():
+    """
+    Log statistics for all graph caches that have been used.
+    """
+    for cache in list(_graph_caches):
+        if cache.stats()["hits"] or cache.stats()["misses"]:
+            cache.log_stats()
+    return
+
+# End.
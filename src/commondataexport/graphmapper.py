@@ -33,6 +33,14 @@ from rdflib.paths   import Path
 
 log = logging.getLogger(__name__)
 
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+EMIT_BUFFER_SIZE = 1000     # Statements buffered before adding to target graph
+
 #   ===================================================================
 #
 #   Helpers
@@ -352,14 +360,20 @@ class GraphMapper(object):
     to a result graph.  The Pattern matching uses a form of path expression, and acts
     as a generator yielding a number of "matches".  In internal structiure of a match 
     is considered private, and methods are provided to extract @@@
+
+    Statements emitted are buffered, and added to the target graph when the buffer
+    is full or when `flush` is called.  Call `flush` when all statements have been 
+    emitted, before using the target graph.
     """
 
-    def __init__(self, src_graph, tgt_graph):
+    def __init__(self, src_graph, tgt_graph, buffer_size=EMIT_BUFFER_SIZE):
         """
         Initialize a graph mapper object with specified source and target graphs.
         """
-        self._src_graph = src_graph
-        self._tgt_graph = tgt_graph
+        self._src_graph   = src_graph
+        self._tgt_graph   = tgt_graph
+        self._buffer_size = buffer_size
+        self._buffer      = []
         return
 
     def match(self, start_node, pattern_list):
@@ -403,7 +417,18 @@ class GraphMapper(object):
         URI strings that are treated as URIRef nodes.
         """
         log.debug("GraphMapper.emit: %r %r %r"%(s, p, o))
-        self._tgt_graph.add((s, p, o))
+        self._buffer.append((s, p, o, self._tgt_graph))
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+        return
+
+    def flush(self):
+        """
+        Adds any buffered statements to the target graph.
+        """
+        if self._buffer:
+            self._tgt_graph.addN(self._buffer)
+            self._buffer = []
         return
 
 
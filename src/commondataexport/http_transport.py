@@ -0,0 +1,453 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# http_transport.py - shared HTTP transport used for all data fetches
+#
+# All HTTP requests issued by the data export utilities are routed through a
+# single `requests.Session`, so that connections to each host are kept alive
+# and re-used rather than being set up afresh for every request.
+#
+# The transport also applies a per-host request rate limit, which adapts to
+# throttling responses from the server, and a retry policy under which failed
+# requests are retried with exponential backoff.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import time
+import random
+import logging
+import threading
+import urlparse
+import email.utils
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+DEFAULT_POOL_CONNECTIONS = 16       # Number of per-host connection pools retained
+DEFAULT_POOL_MAXSIZE     = 10       # Connections kept alive for each host
+DEFAULT_CONNECT_TIMEOUT  = 10.0     # Seconds to wait for a connection
+DEFAULT_READ_TIMEOUT     = 60.0     # Seconds to wait for response data
+
+DEFAULT_MAX_RETRIES      = 4        # Retries after initial request fails
+DEFAULT_BACKOFF_BASE     = 1.0      # Seconds before first retry (before jitter)
+DEFAULT_BACKOFF_MAX      = 60.0     # Maximum backoff between retries
+MAX_RETRY_AFTER          = 300.0    # Maximum delay accepted from Retry-After
+RETRY_STATUS_CODES       = (429, 500, 502, 503, 504)
+THROTTLE_STATUS_CODES    = (429, 503)
+
+#   Default request rate limits (requests per second) for each host.
+#   Hosts not listed here are not rate-limited unless they throttle requests.
+
+HOST_RATE_LIMITS = (
+    { "sws.geonames.org":       10.0
+    , "www.wikidata.org":       20.0
+    , "query.wikidata.org":     5.0
+    , "en.wikipedia.org":       20.0
+    })
+
+THROTTLED_RATE           = 2.0      # Initial rate for unlisted hosts when throttled
+MIN_RATE                 = 0.1      # Lowest rate to which a limit is reduced
+RATE_DECREASE_FACTOR     = 0.5      # Rate multiplier applied on throttling
+RATE_INCREASE_STEP       = 0.05     # Rate increase after each successful request
+
+INITIAL_RATE             = object() # TokenBucket max_rate: limit to the initial rate
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def parse_host_rates(host_rate_strs):
+    """
+    Parse a list of "HOST=RPS" strings (e.g. from the command line),
+    and return a dictionary of per-host request rate limits.
+    """
+    host_rates = {}
+    for hr in host_rate_strs or []:
+        host, rate = hr.rsplit("=", 1)
+        host_rates[host.strip()] = float(rate)
+    return host_rates
+
+def parse_retry_after(retry_after):
+    """
+    Returns the delay in seconds indicated by the value of a Retry-After header,
+    which may be a number of seconds or an HTTP date.  Returns None if the 
+    value cannot be interpreted.
+    """
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    date_tuple = email.utils.parsedate_tz(retry_after)
+    if date_tuple is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date_tuple) - time.time())
+
+#   ===================================================================
+#
+#   Rate limiting
+#
+#   ===================================================================
+
+class TokenBucket(object):
+    """
+    Token bucket used to limit the rate of requests to a single host.
+
+    The rate is adjusted using additive increase and multiplicative decrease:
+    it is reduced sharply when the host throttles a request, and recovers
+    gradually (up to the maximum rate) as requests succeed.
+    """
+
+    def __init__(self, rate, max_rate=INITIAL_RATE, burst=None):
+        """
+        rate        is the initial rate, in requests per second.
+        max_rate    is the rate above which the limit is not increased.  If 
+                    INITIAL_RATE (the default), the limit does not increase 
+                    above `rate`.  If None, the limit may increase indefinitely.
+        burst       is the number of requests that may be issued without delay
+                    after a quiet period.  Defaults to one second's worth.
+        """
+        self.rate      = float(rate)
+        self._max_rate = self.rate if max_rate is INITIAL_RATE else max_rate
+        self._burst    = burst or max(1.0, self.rate)
+        self._tokens   = self._burst
+        self._stamp    = time.time()
+        self._lock     = threading.Lock()
+        return
+
+    def _refill(self):
+        now          = time.time()
+        self._tokens = min(self._burst, self._tokens + (now - self._stamp)*self.rate)
+        self._stamp  = now
+        return
+
+    def acquire(self):
+        """
+        Wait until a request may be issued.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens)/self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        """
+        Note a successful request, and increase the rate if below the maximum.
+        """
+        with self._lock:
+            if (self._max_rate is None) or (self.rate < self._max_rate):
+                self.rate += RATE_INCREASE_STEP
+                if self._max_rate is not None:
+                    self.rate = min(self.rate, self._max_rate)
+        return
+
+    def throttled(self, delay=None):
+        """
+        Note a throttled request: reduce the rate, and if a delay is given,
+        hold off all further requests for that number of seconds.
+        """
+        with self._lock:
+            self._refill()
+            self.rate    = max(MIN_RATE, self.rate*RATE_DECREASE_FACTOR)
+            self._tokens = min(self._tokens, 0.0) - (delay or 0.0)*self.rate
+        return
+
+class RateLimiter(object):
+    """
+    Applies a separate token bucket rate limit to each host accessed.
+    """
+
+    def __init__(self, host_rates=None, rate_share=1.0):
+        """
+        host_rates  is a dictionary of per-host request rate limits, which 
+                    override the defaults in HOST_RATE_LIMITS.
+        rate_share  is the fraction of each host's rate limit that is used by
+                    this limiter.  When several processes access the same hosts,
+                    each is given an equal share, so that their combined rate
+                    stays within the limit.
+        """
+        self._host_rates = dict(HOST_RATE_LIMITS)
+        self._host_rates.update(host_rates or {})
+        self._rate_share = rate_share
+        self._buckets    = {}
+        self._lock       = threading.Lock()
+        return
+
+    def _bucket(self, host, create=False):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                if host in self._host_rates:
+                    bucket = TokenBucket(self._host_rates[host]*self._rate_share)
+                elif create:
+                    bucket = TokenBucket(THROTTLED_RATE*self._rate_share, max_rate=None)
+                if bucket is not None:
+                    self._buckets[host] = bucket
+        return bucket
+
+    def acquire(self, host):
+        """
+        Wait until a request may be issued to the indicated host.
+        """
+        bucket = self._bucket(host)
+        if bucket:
+            bucket.acquire()
+        return
+
+    def succeeded(self, host):
+        bucket = self._bucket(host)
+        if bucket:
+            bucket.succeeded()
+        return
+
+    def throttled(self, host, delay=None):
+        bucket = self._bucket(host, create=True)
+        log.info("Request rate for %s reduced to %.2f/s"%(host, bucket.rate*RATE_DECREASE_FACTOR))
+        bucket.throttled(delay)
+        return
+
+#   ===================================================================
+#
+#   Retry policy
+#
+#   ===================================================================
+
+class RetryPolicy(object):
+    """
+    Determines whether, and after what delay, a failed request is retried.
+
+    Delays increase exponentially with each attempt, with random jitter so that 
+    concurrent requests do not retry in lockstep.  A delay requested by the 
+    server using a Retry-After header is honoured.
+    """
+
+    def __init__(self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_base=DEFAULT_BACKOFF_BASE,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        retry_statuses=RETRY_STATUS_CODES
+        ):
+        self.max_retries     = max_retries
+        self._backoff_base   = backoff_base
+        self._backoff_max    = backoff_max
+        self._retry_statuses = retry_statuses
+        return
+
+    def should_retry(self, attempt, response=None, exc=None):
+        """
+        Returns True if a request is to be retried after the indicated number 
+        of attempts, given its response or the exception raised.
+        """
+        if attempt > self.max_retries:
+            return False
+        if exc is not None:
+            return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+        return response.status_code in self._retry_statuses
+
+    def retry_after(self, response):
+        """
+        Returns the delay requested by a response, or None.
+        """
+        if response is None:
+            return None
+        delay = parse_retry_after(response.headers.get("retry-after"))
+        if delay is not None:
+            delay = min(delay, MAX_RETRY_AFTER)
+        return delay
+
+    def delay(self, attempt, response=None):
+        """
+        Returns the time in seconds to wait before retrying a request after 
+        the indicated number of attempts.
+        """
+        delay = self.retry_after(response)
+        if delay is None:
+            backoff = min(self._backoff_max, self._backoff_base*(2**(attempt-1)))
+            delay   = random.uniform(backoff/2.0, backoff)
+        return delay
+
+#   ===================================================================
+#
+#   HTTP transport class
+#
+#   ===================================================================
+
+class HttpTransport(object):
+    """
+    Issues HTTP requests using a shared session.
+
+    The session is equipped with adapters that maintain a pool of keep-alive
+    connections for each host accessed, so that repeated requests to the same
+    service (e.g. sws.geonames.org, www.wikidata.org) do not each incur the
+    cost of TCP and TLS connection setup.
+    """
+
+    def __init__(self,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        retry_policy=None,
+        rate_limiter=None
+        ):
+        """
+        pool_connections
+                is the number of per-host connection pools that are retained.
+        pool_maxsize
+                is the maximum number of connections kept alive for any one host.
+                This should be at least the number of threads that may concurrently
+                access a single host.
+        connect_timeout
+                is the time in seconds to wait for a connection to be established.
+        read_timeout
+                is the time in seconds to wait for response data.
+        retry_policy
+                is a `RetryPolicy` object that determines how failed requests
+                are retried.  If not specified, a default policy is used.
+        rate_limiter
+                is a `RateLimiter` object that limits the rate of requests
+                to each host.  If not specified, default limits are used.
+        """
+        self._pool_connections = pool_connections
+        self._pool_maxsize     = pool_maxsize
+        self._timeout          = (connect_timeout, read_timeout)
+        self._retry_policy     = retry_policy or RetryPolicy()
+        self._rate_limiter     = rate_limiter or RateLimiter()
+        self._session          = self._new_session()
+        return
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize
+            )
+        session.mount("http://",  adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self._session.close()
+        return
+
+    def request(self, method, url, req_headers={}, allow_redirects=True):
+        """
+        Issue an HTTP request using the shared session, and return the response.
+
+        The request is subject to the rate limit for the host accessed, and is 
+        retried according to the retry policy.  If the retries are exhausted,
+        the last response is returned, or the last exception raised.
+        """
+        host    = urlparse.urlsplit(url).netloc
+        attempt = 0
+        while True:
+            attempt += 1
+            self._rate_limiter.acquire(host)
+            log.debug("HttpTransport.request: %s %s (%d)"%(method, url, attempt))
+            response = None
+            delay    = None
+            try:
+                response = self._session.request(
+                    method, url,
+                    headers=req_headers,
+                    allow_redirects=allow_redirects,
+                    timeout=self._timeout
+                    )
+            except Exception as e:
+                if not self._retry_policy.should_retry(attempt, exc=e):
+                    raise
+                log.warning("%s %s failed (%s): retrying"%(method, url, e))
+            else:
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    # Any Retry-After delay is applied to all requests to the host
+                    # by the rate limiter, so is not also applied here.
+                    delay = self._retry_policy.retry_after(response)
+                    self._rate_limiter.throttled(host, delay)
+                    if delay is not None:
+                        delay = 0.0
+                elif response.status_code < 400:
+                    self._rate_limiter.succeeded(host)
+                if not self._retry_policy.should_retry(attempt, response=response):
+                    return response
+                log.warning(
+                    "%s %s returned status %d: retrying"%(method, url, response.status_code)
+                    )
+            if delay is None:
+                delay = self._retry_policy.delay(attempt, response)
+            time.sleep(delay)
+
+    def get(self, url, req_headers={}):
+        """
+        Issue an HTTP GET request, and return the response.
+        """
+        return self.request("GET", url, req_headers=req_headers)
+
+    def head(self, url, req_headers={}, allow_redirects=True):
+        """
+        Issue an HTTP HEAD request, and return the response.
+        """
+        return self.request(
+            "HEAD", url, req_headers=req_headers, allow_redirects=allow_redirects
+            )
+
+#   ===================================================================
+#
+#   Shared transport instance
+#
+#   ===================================================================
+
+_http_transport      = None
+_http_transport_lock = threading.Lock()
+
+def configure_http_transport(**kwargs):
+    """
+    Replace the shared HTTP transport with one created using the supplied
+    keyword parameters (see `HttpTransport`).  Parameters whose value is
+    None are not passed, so that defaults apply.
+
+    Returns the new transport object.
+    """
+    global _http_transport
+    params = dict( (k, v) for k, v in kwargs.items() if v is not None )
+    with _http_transport_lock:
+        if _http_transport is not None:
+            _http_transport.close()
+        _http_transport = HttpTransport(**params)
+    return _http_transport
+
+def get_http_transport():
+    """
+    Returns the shared HTTP transport, creating it with default settings if needed.
+    """
+    global _http_transport
+    if _http_transport is None:
+        with _http_transport_lock:
+            if _http_transport is None:
+                _http_transport = HttpTransport()
+    return _http_transport
+
+# End.
@@ -0,0 +1,235 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# progress_journal.py - persistent record of progress for bulk commands
+#
+# A progress journal is an SQLite database that records, for each item (place
+# id) processed by a bulk command, whether it is pending, done or failed, the
+# error reported for a failed item, and the run and output chunk in which the
+# data for a completed item was written.  This allows an interrupted run to be
+# resumed without repeating completed work, and failed items to be retried.
+#
+# Each update is committed as it is made, so the journal reflects progress up
+# to the point at which a run is stopped.  SQLite locking allows several worker
+# processes to update the same journal, each using its own connection.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import logging
+import sqlite3
+import datetime
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+STATUS_PENDING  = "pending"
+STATUS_DONE     = "done"
+STATUS_FAILED   = "failed"
+
+JOURNAL_TIMEOUT = 60.0      # Seconds to wait for a lock held by another process
+
+JOURNAL_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+        command     TEXT NOT NULL,
+        started     TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS items (
+        command     TEXT NOT NULL,
+        item_id     TEXT NOT NULL,
+        status      TEXT NOT NULL,
+        error       TEXT,
+        run_id      INTEGER,
+        chunk       TEXT,
+        updated     TEXT NOT NULL,
+        PRIMARY KEY (command, item_id)
+    );
+    CREATE INDEX IF NOT EXISTS items_status ON items (command, status);
+    """)
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def timestamp():
+    """
+    Returns the current time as an ISO8601 string.
+    """
+    return datetime.datetime.utcnow().isoformat()
+
+def error_text(error):
+    """
+    Returns a unicode description of an exception or other error value, even
+    if its message is a byte string that is not ASCII.
+    """
+    try:
+        return unicode(error)
+    except UnicodeError:
+        pass
+    try:
+        return str(error).decode("utf-8", "replace")
+    except UnicodeError:
+        return repr(error).decode("ascii", "replace")
+
+#   ===================================================================
+#
+#   Progress journal
+#
+#   ===================================================================
+
+class ProgressJournal(object):
+    """
+    Records the progress of a bulk command in an SQLite database file.
+
+    Items are recorded separately for each command, so that one journal file
+    may be used for several different commands.
+    """
+
+    def __init__(self, journal_file, command, run_id=None):
+        """
+        journal_file    is the name of the SQLite database file, which is created
+                        if it does not exist.
+        command         is the name of the bulk command whose progress is recorded.
+        run_id          if supplied, identifies an existing run that is continued
+                        (e.g. by a worker process).  Otherwise, a new run is
+                        recorded.
+        """
+        self._journal_file  = journal_file
+        self._command       = command
+        self._db            = sqlite3.connect(journal_file, timeout=JOURNAL_TIMEOUT)
+        self._db.executescript(JOURNAL_SCHEMA)
+        if run_id is None:
+            with self._db:
+                cursor = self._db.execute(
+                    "INSERT INTO runs (command, started) VALUES (?, ?)",
+                    (command, timestamp())
+                    )
+            run_id = cursor.lastrowid
+        self.run_id = run_id
+        return
+
+    @property
+    def journal_file(self):
+        return self._journal_file
+
+    def close(self):
+        self._db.close()
+        return
+
+    def start_run(self, item_ids, resume=False, retry_failed=False):
+        """
+        Select items to be processed by the current run, and record them as pending.
+
+        item_ids        is a list of all items supplied to the command.
+        resume          if True, items that have already been completed are skipped.
+        retry_failed    if True, only items that previously failed are selected.
+
+        Returns a list of the selected item ids, in the order supplied.
+        """
+        prev_status = dict(
+            self._db.execute(
+                "SELECT item_id, status FROM items WHERE command = ?",
+                (self._command,)
+                )
+            )
+        if retry_failed:
+            selected = [ i for i in item_ids if prev_status.get(i) == STATUS_FAILED ]
+        elif resume:
+            selected = [ i for i in item_ids if prev_status.get(i) != STATUS_DONE ]
+        else:
+            selected = list(item_ids)
+        now = timestamp()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items "+
+                "(command, item_id, status, error, run_id, chunk, updated) "+
+                "VALUES (?, ?, ?, NULL, ?, NULL, ?)",
+                [ (self._command, i, STATUS_PENDING, self.run_id, now) for i in selected ]
+                )
+        log.info(
+            "ProgressJournal: run %d of %s, %d of %d items selected"%
+            (self.run_id, self._command, len(selected), len(item_ids))
+            )
+        return selected
+
+    def mark_done(self, item_id, chunk=None):
+        """
+        Record that data for an item has been written to the indicated output chunk.
+        """
+        with self._db:
+            self._db.execute(
+                "UPDATE items SET status = ?, error = NULL, chunk = ?, updated = ? "+
+                "WHERE command = ? AND item_id = ?",
+                (STATUS_DONE, chunk, timestamp(), self._command, item_id)
+                )
+        return
+
+    def mark_failed(self, item_id, error):
+        """
+        Record that an item could not be processed, with a description of the error.
+        """
+        with self._db:
+            self._db.execute(
+                "UPDATE items SET status = ?, error = ?, updated = ? "+
+                "WHERE command = ? AND item_id = ?",
+                (STATUS_FAILED, error_text(error), timestamp(), self._command, item_id)
+                )
+        return
+
+    def mark_pending_done(self, item_ids, chunk=None):
+        """
+        Record that data for all of the supplied items that are still pending in
+        the current run has been written to the indicated output chunk.  Items
+        that have failed are not changed.
+        """
+        now = timestamp()
+        with self._db:
+            self._db.executemany(
+                "UPDATE items SET status = ?, chunk = ?, updated = ? "+
+                "WHERE command = ? AND item_id = ? AND status = ? AND run_id = ?",
+                [ (STATUS_DONE, chunk, now, self._command, i, STATUS_PENDING, self.run_id)
+                  for i in item_ids
+                ]
+                )
+        return
+
+    def status_counts(self):
+        """
+        Returns a dictionary of the number of items recorded with each status.
+        """
+        return dict(
+            self._db.execute(
+                "SELECT status, COUNT(*) FROM items WHERE command = ? GROUP BY status",
+                (self._command,)
+                )
+            )
+
+    def log_summary(self):
+        """
+        Log a summary of the items recorded for the current command.
+        """
+        counts = self.status_counts()
+        log.info(
+            "ProgressJournal: %s: %d done, %d failed, %d pending"%
+            ( self._command,
+              counts.get(STATUS_DONE, 0), counts.get(STATUS_FAILED, 0),
+              counts.get(STATUS_PENDING, 0)
+            )
+            )
+        return
+
+# End.
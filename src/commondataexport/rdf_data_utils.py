@@ -18,13 +18,17 @@ import errno
 import re
 import urlparse
 import logging
+import hashlib
 import requests
 
 from rdflib         import Graph, Namespace, URIRef, Literal, BNode, RDF, RDFS
 from rdflib.paths   import Path
 
-from emplaces_defs  import GN, SKOS, PLACE, COMMON_PREFIX_DEFS
+from emplaces_defs  import GN, SKOS, PLACE, GENID, COMMON_PREFIX_DEFS
 from dataextractmap import DataExtractMap
+from http_transport import get_http_transport
+from fetch_engine   import get_fetch_engine
+from disk_cache     import get_disk_cache
 
 log = logging.getLogger(__name__)
 
@@ -143,13 +147,42 @@ def http_get(url, req_headers={}):
     """
     Issue an HTTP GET request to the supplied URL, and return the result data.
     """
-    response = requests.get(url, headers=req_headers)
+    response = get_http_transport().get(url, req_headers=req_headers)
     response.raise_for_status()  # raise an error on unsuccessful status codes
     return response.text
 
+def get_response_validators(response):
+    """
+    Returns a dictionary of validators (ETag and Last-Modified) from an 
+    HTTP response, for saving with a cached copy of the response data.
+    """
+    meta = {}
+    if "etag" in response.headers:
+        meta["etag"] = response.headers["etag"]
+    if "last-modified" in response.headers:
+        meta["last_modified"] = response.headers["last-modified"]
+    return meta
+
+def get_conditional_headers(meta):
+    """
+    Returns HTTP request headers for a conditional request, based on 
+    validators previously saved by `get_response_validators`.
+    """
+    req_headers = {}
+    if "etag" in meta:
+        req_headers["if-none-match"] = meta["etag"]
+    if "last_modified" in meta:
+        req_headers["if-modified-since"] = meta["last_modified"]
+    return req_headers
+
 def get_rdf_resource(url, format):
     """
-    Retrieve a web resource, negotiating for a specific content-type
+    Retrieve a web resource, negotiating for a specific content-type.
+
+    Resources retrieved by HTTP are saved in, and subsequently read from, 
+    the disk cache (see `disk_cache.get_disk_cache`).  If the cache has been 
+    set up for revalidation, a cached resource is checked with a conditional 
+    request the first time it is used, and replaced if it has changed.
     """
     if url.startswith("file://"):
         # Local file
@@ -158,20 +191,9 @@ def get_rdf_resource(url, format):
             text = f.read().decode("utf-8")
     else:
         # HTTP
-        cache_dir  = os.path.join(os.getcwd(), "./_rdf_data_cache", format)
-        cache_key  = url.split("://", 1)[1]
-        cache_key  = cache_key.replace("/", ".")
-        cache_file = os.path.join(cache_dir, cache_key)
-        try:
-            os.makedirs(cache_dir)
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                raise
-        if os.path.exists(cache_file):
-            # Return cached file
-            with open(cache_file, "r") as f:
-                text = f.read().decode("utf-8")
-        else:
+        cache = get_disk_cache()
+        text  = cache.get(url, format)
+        if (text is None) or cache.needs_revalidation(url, format):
             content_types = (
                 { "turtle":     "text/turtle"
                 , "xml":        "application/rdf+xml"
@@ -179,26 +201,92 @@ def get_rdf_resource(url, format):
                 , "jsonld":     "application/ld+json"
                 })
             content_type = content_types.get(format, content_types["turtle"])
-            text = http_get(url, {"accept": content_type})
-            # Save to cache..
-            with open(cache_file, "w") as f:
-                f.write(text.encode("utf-8"))
+            req_headers  = {"accept": content_type}
+            if text is not None:
+                req_headers.update(get_conditional_headers(cache.get_meta(url, format)))
+            try:
+                response = get_http_transport().get(url, req_headers=req_headers)
+                if (text is not None) and (response.status_code == 304):
+                    log.debug("get_rdf_resource: %s not modified"%(url,))
+                else:
+                    response.raise_for_status()
+                    text = response.text
+                    # Save to cache..
+                    cache.put(url, format, text, get_response_validators(response))
+            except Exception as e:
+                if text is None:
+                    raise
+                log.warning("Revalidation of %s failed (%s): using cached data"%(url, e))
     return text
 
 def get_rdf_graph(url, format="turtle"):
     """
     Return RDF graph at given location.
+
+    Parsed RDF data is saved in the disk cache, keyed by a hash of the
+    resource text, so that unchanged resources are not parsed again.
     """
     # e.g. http://sws.geonames.org/3090048/about.rdf
-    rdftext = get_rdf_resource(url, format)
+    rdftext    = get_rdf_resource(url, format)
+    cache      = get_disk_cache()
+    parsed_key = cache.parsed_key(rdftext, format)
+    parsed     = cache.get_parsed(parsed_key)
+    if parsed is not None:
+        return make_parsed_graph(parsed)
     g = Graph()
     try:
         g.parse(data=rdftext, format=format)
     except Exception as e:
         print("RDF parse error '%s' (%s)"%(url, e), file=sys.stderr)
         raise e
+    cache.put_parsed(parsed_key, get_parsed_data(g))
+    return g
+
+def get_parsed_data(g):
+    """
+    Returns the namespace bindings and triples of a graph as a tuple of 
+    two lists, suitable for saving in the disk cache.
+    """
+    return (list(g.namespaces()), list(g.triples((None, None, None))))
+
+def make_parsed_graph(parsed_data):
+    """
+    Returns a new graph containing namespace bindings and triples previously 
+    obtained by `get_parsed_data`.
+
+    Blank nodes are replaced with new blank nodes, so that graphs loaded from 
+    the same parsed data do not share blank nodes.
+    """
+    namespaces, triples = parsed_data
+    g      = Graph()
+    bnodes = {}
+    def node(n):
+        if isinstance(n, BNode):
+            if n not in bnodes:
+                bnodes[n] = BNode()
+            return bnodes[n]
+        return n
+    for prefix, ns_uri in namespaces:
+        g.bind(prefix, ns_uri)
+    g.addN( (node(s), p, node(o), g) for s, p, o in triples )
     return g
 
+def get_many_rdf_graphs(urls, format="turtle"):
+    """
+    Return RDF graphs at the given locations, fetched using the currently
+    selected fetch engine (see `fetch_engine.set_fetch_engine`).
+
+    Returns a dictionary that maps each URL to its graph.  Any URL whose data
+    cannot be retrieved or parsed is reported and omitted from the result.
+    """
+    graphs = {}
+    for url, g, e in get_fetch_engine().map(lambda u: get_rdf_graph(u, format), urls):
+        if e is None:
+            graphs[url] = g
+        else:
+            print("RDF fetch error '%s' (%s)"%(url, e), file=sys.stderr)
+    return graphs
+
 def get_rdf_graph_old(url, format="turtle"):
     """
     Return RDF graph at given location.
@@ -247,6 +335,79 @@ def add_turtle_data(emp_rdf, turtle_str):
         )
     return emp_rdf
 
+def add_graph_data(emp_rdf, src_rdf):
+    """
+    Adds all statements and namespace bindings from one graph to another.
+
+    emp_rdf     is the graph to which statements are added
+    src_rdf     is a graph whose statements are added
+
+    Returns the updated graph.
+    """
+    for prefix, ns_uri in src_rdf.namespaces():
+        emp_rdf.bind(prefix, ns_uri)
+    emp_rdf += src_rdf
+    return emp_rdf
+
+def skolemize_graph(src_rdf, tgt_rdf=None):
+    """
+    Copies all statements from one graph to another, replacing blank nodes 
+    with skolem IRIs derived from the content of the source graph.
+
+    The IRI for a blank node is a hash of the statements about it (including 
+    any blank nodes they refer to, recursively), and of the statements that 
+    refer to it.  Thus, the same data always yields the same IRIs, and data 
+    for different places (which refer to different place IRIs) yields 
+    different IRIs.
+
+    src_rdf     is a graph whose statements are copied
+    tgt_rdf     is the graph to which statements are added.  If not specified,
+                a new graph is created.
+
+    Returns the target graph.
+    """
+    if tgt_rdf is None:
+        tgt_rdf = Graph()
+    content_hashes = {}
+    def node_text(node, active):
+        if isinstance(node, BNode):
+            return "_:" + content_hash(node, active)
+        return node.n3()
+    def content_hash(bnode, active):
+        if bnode in content_hashes:
+            return content_hashes[bnode]
+        if bnode in active:
+            return "cycle"
+        active.add(bnode)
+        stmts = sorted(
+            p.n3() + " " + node_text(o, active) 
+            for p, o in src_rdf.predicate_objects(bnode)
+            )
+        active.discard(bnode)
+        content_hashes[bnode] = hashlib.sha1("\n".join(stmts).encode("utf-8")).hexdigest()
+        return content_hashes[bnode]
+    skolem_iris = {}
+    def skolem_iri(node):
+        if not isinstance(node, BNode):
+            return node
+        if node not in skolem_iris:
+            refs = sorted(
+                node_text(s, set()) + " " + p.n3() 
+                for s, p in src_rdf.subject_predicates(node)
+                )
+            node_hash = hashlib.sha1(content_hash(node, set()).encode("ascii"))
+            node_hash.update("\n".join(refs).encode("utf-8"))
+            skolem_iris[node] = GENID[node_hash.hexdigest()]
+        return skolem_iris[node]
+    for prefix, ns_uri in src_rdf.namespaces():
+        tgt_rdf.bind(prefix, ns_uri)
+    tgt_rdf.bind("genid", GENID.term(""))
+    tgt_rdf.addN(
+        (skolem_iri(s), p, skolem_iri(o), tgt_rdf) 
+        for s, p, o in src_rdf
+        )
+    return tgt_rdf
+
 def add_resource_attributes(emp_rdf, attributes, subject=None):
     """
     Adds a set of attributes to a graph.
@@ -285,9 +446,12 @@ def get_geonames_place_type_id(place_type):
     type_id = tokens[-1]
     return type_id
 
-def get_geonames_place_type_label(place_type, geo_ont_rdf):
+def get_geonames_place_type_labels(geo_ont_rdf):
     """
-    Returns label for supplied GeoNames place type
+    Returns a dictionary that maps GeoNames place types (feature codes) to
+    labels, using English labels from the supplied GeoNames ontology graph.
+
+    The result is intended to be built once and used for many places.
     """
     # Alternatives to ontology labels
     place_type_labels = (
@@ -301,22 +465,32 @@ def get_geonames_place_type_label(place_type, geo_ont_rdf):
         , GN["A.PCLI"]:  "Country"
         , GN["L.RGN"]:   "Region (L.RGN)"
         })
-    if place_type in place_type_labels:
-        type_label = Literal(place_type_labels[place_type])
-    else:
-        type_labels = geo_ont_rdf[place_type:SKOS.prefLabel:]
-        for l in type_labels:
-            if getattr(l, "language", "en") == "en":
-                type_label  = Literal(" ".join(str(l).split()))
-                # https://stackoverflow.com/a/46501496/324122 (normalize whitespace)
+    type_labels = {}
+    for place_type, _, l in geo_ont_rdf.triples((None, SKOS.prefLabel, None)):
+        if getattr(l, "language", "en") == "en":
+            type_labels[place_type] = Literal(" ".join(unicode(l).split()))
+            # https://stackoverflow.com/a/46501496/324122 (normalize whitespace)
+    for place_type in place_type_labels:
+        type_labels[place_type] = Literal(place_type_labels[place_type])
+    return type_labels
+
+def get_geonames_place_type_label(place_type, type_labels):
+    """
+    Returns label for supplied GeoNames place type, using a dictionary 
+    obtained from `get_geonames_place_type_labels`.  If no label is 
+    defined, the place type id is returned.
+    """
+    type_label = type_labels.get(place_type)
+    if type_label is None:
+        type_label = Literal(get_geonames_place_type_id(place_type))
     return type_label
 
-def format_id_name(pid, pname, ptype, geo_ont_rdf):
+def format_id_name(pid, pname, ptype, type_labels):
     log.debug("format_id_name: (%r, %r, %r)"%(pid, pname, ptype))
     return (
         unicode(pid).ljust(8) +
         "  # " + unicode(pname) +
-        " ("   + get_geonames_place_type_label(ptype, geo_ont_rdf) +
+        " ("   + get_geonames_place_type_label(ptype, type_labels) +
         ")").encode('utf8')
 
 def format_id_text(pid, ptext):
@@ -0,0 +1,113 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# rdf_stream_writer.py - incremental output of RDF data for bulk commands
+#
+# Rather than accumulating data for all places in a single graph and
+# serializing it at the end of a run, bulk commands can write the data for
+# each place as soon as it has been generated.  Output is written either as
+# N-Triples, or as a sequence of Turtle blocks that share a single set of
+# prefix declarations written at the start of the output.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import logging
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+#   Output format names, and corresponding rdflib serializer names
+
+OUTPUT_FORMATS = (
+    { "turtle":     "turtle"
+    , "ntriples":   "nt"
+    })
+
+DEFAULT_OUTPUT_FORMAT = "turtle"
+
+#   ===================================================================
+#
+#   Stream writer
+#
+#   ===================================================================
+
+class RDFStreamWriter(object):
+    """
+    Writes a sequence of graphs to an output stream, in N-Triples or Turtle
+    format, flushing the output after each graph.
+
+    For Turtle output, prefix declarations for the namespaces bound in a
+    supplied graph are written once, at the start of the output, and are
+    omitted from the blocks written for each graph.  Any other prefix that
+    is used by a graph is declared in the block for that graph.
+    """
+
+    def __init__(self, output, format=DEFAULT_OUTPUT_FORMAT, namespace_graph=None):
+        """
+        output          is a file-like object to which serialized data is written.
+        format          is one of the keys of OUTPUT_FORMATS.
+        namespace_graph is a graph whose namespace bindings are declared at the
+                        start of Turtle output.
+        """
+        self._output        = output
+        self._format        = format
+        self._prefix_lines  = set()
+        self.graph_count    = 0
+        self.triple_count   = 0
+        if format == "turtle" and namespace_graph is not None:
+            self._write_prefixes(namespace_graph)
+        return
+
+    def _write_prefixes(self, namespace_graph):
+        """
+        Write prefix declarations for the namespaces bound in the supplied graph,
+        in the same form as the rdflib Turtle serializer.
+        """
+        for prefix, namespace in sorted(namespace_graph.namespaces()):
+            line = ("@prefix %s: <%s> .\n"%(prefix, namespace)).encode("utf-8")
+            self._prefix_lines.add(line)
+            self._output.write(line)
+        self._output.write(b"\n")
+        self._output.flush()
+        return
+
+    def write_graph(self, graph):
+        """
+        Write the supplied graph to the output stream.
+        """
+        if graph is None:
+            return
+        if self._format == "turtle":
+            lines = graph.serialize(format="turtle", indent=4).splitlines(True)
+            data  = b"".join([ l for l in lines if l not in self._prefix_lines ])
+        else:
+            data  = graph.serialize(format=OUTPUT_FORMATS[self._format])
+        self._output.write(data)
+        self._output.flush()
+        self.graph_count  += 1
+        self.triple_count += len(graph)
+        return
+
+    def close(self):
+        """
+        Flush output and log a summary of the data written.
+        """
+        self._output.flush()
+        log.info(
+            "RDFStreamWriter: %d graphs, %d triples written"%
+            (self.graph_count, self.triple_count)
+            )
+        return
+
+# End.
@@ -0,0 +1,294 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# wikidata_api.py - batched access to Wikidata entity data
+#
+# Rather than retrieving the full RDF data for each Wikidata entity, which for
+# well-documented places can be very large, the Wikidata API `wbgetentities`
+# action is used to retrieve JSON data for up to 50 entities in a single
+# request.  Only the labels, claims and sitelinks that are used are kept, and
+# these are saved in the disk cache for each entity.
+#
+# The retained data is presented as an RDF graph using the same terms as the
+# Wikidata RDF data ("truthy" `wdt:` statements, `rdfs:label` and `schema:`
+# article descriptions), so that it can be used with the existing mappings.
+#
+# A Wikidata entity store provides the graph for each entity, obtained either
+# from the Wikidata API or from the full Wikidata RDF data, to all of the 
+# functions that use it, so that each entity is retrieved just once in a run.
+#
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+__author__      = "Graham Klyne (GK@ACM.ORG)"
+__copyright__   = "Copyright 2018, Graham Klyne and University of Oxford"
+__license__     = "MIT (http://opensource.org/licenses/MIT)"
+
+import json
+import logging
+import threading
+
+from rdflib         import Graph, URIRef, Literal, RDF, RDFS
+
+from emplaces_defs  import WD, WDT, SCHEMA
+from dataextractmap import http_get_json, make_query_url
+from disk_cache     import get_disk_cache
+from graph_cache    import LRUGraphCache
+from rdf_data_utils import get_rdf_graph
+
+log = logging.getLogger(__name__)
+
+#   ===================================================================
+#
+#   Data constants
+#
+#   ===================================================================
+
+WIKIDATA_API_URL            = "https://www.wikidata.org/w/api.php"
+WIKIDATA_API_BATCH_SIZE     = 50        # Maximum entities per wbgetentities request
+WIKIDATA_ENTITY_DATA_URL    = "https://www.wikidata.org/wiki/Special:EntityData/%s"
+
+#   Languages and Wikipedia sites for which labels and sitelinks are retained
+
+WIKIDATA_LANGUAGES          = ["en"]
+WIKIDATA_SITES              = ["enwiki"]
+
+#   ===================================================================
+#
+#   Helpers
+#
+#   ===================================================================
+
+def wikidata_entity_data_url(wikidata_id, suffix=".ttl"):
+    """
+    Returns the URL of the data for a Wikidata entity in the format indicated
+    by the supplied suffix.  For ".ttl", this is the URL obtained by content
+    negotiation for Turtle data from the entity URI.
+    """
+    return WIKIDATA_ENTITY_DATA_URL%(wikidata_id,) + suffix
+
+def wikidata_cache_format(properties):
+    """
+    Returns the format name used for disk cache entries that contain entity
+    data retained for the supplied list of properties.
+    """
+    return "wbgetentities:" + ",".join(sorted(properties))
+
+def select_entity_data(entity, properties):
+    """
+    Returns a copy of the supplied wbgetentities entity data that contains just
+    the labels, claims for the indicated properties, and sitelinks.
+    """
+    claims = entity.get("claims", {})
+    return (
+        { "id":         entity["id"]
+        , "labels":     entity.get("labels", {})
+        , "claims":     dict( (p, claims[p]) for p in properties if p in claims )
+        , "sitelinks":  entity.get("sitelinks", {})
+        })
+
+def truthy_claims(statements):
+    """
+    Returns those of the supplied statements for a property that have the best
+    rank, corresponding to the "truthy" `wdt:` statements in Wikidata RDF data.
+    """
+    preferred = [ s for s in statements if s.get("rank") == "preferred" ]
+    return preferred or [ s for s in statements if s.get("rank") == "normal" ]
+
+def claim_value_node(mainsnak):
+    """
+    Returns an RDF node for the value of a Wikidata statement, or None if the
+    statement has no value or a value type that is not handled.
+    """
+    if mainsnak.get("snaktype") != "value":
+        return None
+    datavalue = mainsnak["datavalue"]
+    if datavalue["type"] == "string":
+        return Literal(datavalue["value"])
+    if datavalue["type"] == "wikibase-entityid":
+        return WD[datavalue["value"]["id"]]
+    return None
+
+#   ===================================================================
+#
+#   Entity data access
+#
+#   ===================================================================
+
+def get_wikidata_entities(wikidata_ids, properties):
+    """
+    Returns a dictionary that maps each of the supplied Wikidata Ids to the
+    retained data for the corresponding entity (see `select_entity_data`),
+    or to None if there is no such entity.
+
+    Entity data is read from the disk cache where available.  Other entities
+    are retrieved using the Wikidata API, WIKIDATA_API_BATCH_SIZE at a time,
+    and saved in the disk cache.
+    """
+    cache        = get_disk_cache()
+    cache_format = wikidata_cache_format(properties)
+    entities     = {}
+    fetch_ids    = []
+    for wikidata_id in wikidata_ids:
+        text = cache.get(wikidata_entity_data_url(wikidata_id, ".json"), cache_format)
+        if text is None:
+            fetch_ids.append(wikidata_id)
+        else:
+            entities[wikidata_id] = json.loads(text)
+    for n in range(0, len(fetch_ids), WIKIDATA_API_BATCH_SIZE):
+        batch_ids = fetch_ids[n:n+WIKIDATA_API_BATCH_SIZE]
+        log.debug("get_wikidata_entities: %s"%("|".join(batch_ids),))
+        query_url = make_query_url(WIKIDATA_API_URL,
+            action="wbgetentities",
+            ids="|".join(batch_ids),
+            props="labels|claims|sitelinks/urls",
+            languages="|".join(WIKIDATA_LANGUAGES),
+            sitefilter="|".join(WIKIDATA_SITES),
+            format="json"
+            )
+        response_data = json.loads(http_get_json(query_url))
+        if "error" in response_data:
+            raise ValueError(
+                "Wikidata API error for %s (%s)"%
+                ("|".join(batch_ids), response_data["error"].get("info"))
+                )
+        for entity_key, entity in response_data.get("entities", {}).items():
+            # Entities that have been redirected are returned under the new Id
+            wikidata_id = entity.get("redirects", {}).get("from", entity_key)
+            if "missing" in entity:
+                entities[wikidata_id] = None
+                continue
+            entity = select_entity_data(entity, properties)
+            cache.put(
+                wikidata_entity_data_url(wikidata_id, ".json"), cache_format,
+                json.dumps(entity)
+                )
+            entities[wikidata_id] = entity
+    return entities
+
+def get_wikidata_entity_graph(wikidata_id, entity):
+    """
+    Returns an RDF graph of retained data for a Wikidata entity, using the same
+    terms that are used by Wikidata RDF data.
+    """
+    entity_rdf  = Graph()
+    entity_rdf.bind("wd",     WD.term(""))
+    entity_rdf.bind("wdt",    WDT.term(""))
+    entity_rdf.bind("schema", SCHEMA.term(""))
+    entity_node = WD[wikidata_id]
+    for label in entity["labels"].values():
+        entity_rdf.add((entity_node, RDFS.label, Literal(label["value"], lang=label["language"])))
+    for prop, statements in entity["claims"].items():
+        for statement in truthy_claims(statements):
+            value_node = claim_value_node(statement["mainsnak"])
+            if value_node is not None:
+                entity_rdf.add((entity_node, WDT[prop], value_node))
+    for site, sitelink in entity["sitelinks"].items():
+        # e.g. "enwiki" -> https://en.wikipedia.org/wiki/...
+        if not (site.endswith("wiki") and sitelink.get("url")):
+            continue
+        lang         = site[:-len("wiki")]
+        article_node = URIRef(sitelink["url"])
+        entity_rdf.add((article_node, RDF.type,          SCHEMA.Article))
+        entity_rdf.add((article_node, SCHEMA.about,      entity_node))
+        entity_rdf.add((article_node, SCHEMA.inLanguage, Literal(lang)))
+        entity_rdf.add((article_node, SCHEMA.isPartOf,   URIRef("https://%s.wikipedia.org/"%(lang,))))
+        entity_rdf.add((article_node, SCHEMA.name,       Literal(sitelink["title"], lang=lang)))
+    return entity_rdf
+
+#   ===================================================================
+#
+#   Wikidata entity store
+#
+#   ===================================================================
+
+class WikidataEntityStore(object):
+    """
+    Provides graphs of Wikidata entity data, keyed by Wikidata Id.
+
+    Graphs are obtained using the Wikidata API, or from the full Wikidata RDF
+    data for each entity, and are held in a bounded in-memory cache.  Both 
+    sources also use the disk cache.
+    """
+
+    def __init__(self, use_api=False, properties=None):
+        """
+        use_api         if True, entity data is obtained using the Wikidata API,
+                        otherwise from the Wikidata RDF data for each entity.
+        properties      is a list of the Wikidata properties whose values are 
+                        retained when using the Wikidata API.
+        """
+        self._use_api    = use_api
+        self._properties = properties or []
+        self._graphs     = LRUGraphCache("wikidata_cache")
+        return
+
+    def entity_data_url(self, wikidata_id):
+        """
+        Returns the URL of the Wikidata RDF data for an entity, which is used
+        to reference the source of data from the entity.
+        """
+        return wikidata_entity_data_url(wikidata_id)
+
+    def get_entity_graph(self, wikidata_id):
+        """
+        Returns a graph of Wikidata data for the indicated entity.
+        """
+        return self._graphs.get_or_load(wikidata_id, self._load_entity_graph)
+
+    def get_entity_graphs(self, wikidata_ids):
+        """
+        Returns a dictionary that maps each of the supplied Wikidata Ids to a graph
+        of data for the corresponding entity, or to None if there is no such entity.
+
+        When using the Wikidata API, entities not already held are retrieved
+        many at a time.
+        """
+        entity_graphs = dict( (i, self._graphs.get(i)) for i in wikidata_ids )
+        load_ids      = [ i for i in wikidata_ids if entity_graphs[i] is None ]
+        if self._use_api and load_ids:
+            entities = get_wikidata_entities(load_ids, self._properties)
+            for wikidata_id in load_ids:
+                if entities.get(wikidata_id) is not None:
+                    entity_graphs[wikidata_id] = get_wikidata_entity_graph(
+                        wikidata_id, entities[wikidata_id]
+                        )
+                    self._graphs.put(wikidata_id, entity_graphs[wikidata_id])
+        else:
+            for wikidata_id in load_ids:
+                entity_graphs[wikidata_id] = self.get_entity_graph(wikidata_id)
+        return entity_graphs
+
+    def _load_entity_graph(self, wikidata_id):
+        if self._use_api:
+            entity = get_wikidata_entities([wikidata_id], self._properties).get(wikidata_id)
+            if entity is None:
+                raise ValueError("No Wikidata entity %s"%(wikidata_id,))
+            return get_wikidata_entity_graph(wikidata_id, entity)
+        return get_rdf_graph(self.entity_data_url(wikidata_id), format="turtle")
+
+_wikidata_entity_store      = None
+_wikidata_entity_store_lock = threading.Lock()
+
+def set_wikidata_entity_store(store):
+    """
+    Select the Wikidata entity store used for all access to Wikidata entity data.
+    """
+    global _wikidata_entity_store
+    _wikidata_entity_store = store
+    return store
+
+def get_wikidata_entity_store():
+    """
+    Returns the selected Wikidata entity store, creating one with default 
+    settings if needed.
+    """
+    global _wikidata_entity_store
+    if _wikidata_entity_store is None:
+        with _wikidata_entity_store_lock:
+            if _wikidata_entity_store is None:
+                _wikidata_entity_store = WikidataEntityStore()
+    return _wikidata_entity_store
+
+# End.
@@ -491,7 +491,7 @@ def convert_to_lpif(emplaces_rdf, place_curie, lpif_rdf):
     # Moved out of loop so that only one label is used
     m.emit(lpif_place_uri,        RDFS.label,    lpif_place_label)
     m.emit(lpif_place_properties, DCTERMS.title, lpif_place_label)
-
+    m.flush()
     return lpif_rdf
 
 #   ===================================================================
@@ -9,15 +9,13 @@
 # NOTE: sed (on MacOS) fails silently if the first line number is zero.
 
 DATE=$(date "+%Y%m%d")
-FROM="0201"
-TO="0300"
-SELECT="$FROM-$TO"
+WORKERS=$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 4)
 DATADIR=data-$DATE
 
 # Write GeoNames IDs to new file
 
 mkdir $DATADIR
-echo "Extracting data for EMLO place references $FROM-$TO from geonames" > $DATADIR/geonames-ids-from-EMLO.log
+echo "Extracting data for EMLO place references from geonames" > $DATADIR/geonames-ids-from-EMLO.log
 echo "Data extraction starts: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
 
 python get_geonames_data.py manygeo \
@@ -27,33 +25,26 @@ python get_geonames_data.py manygeo \
 echo "Created $DATADIR/geonames-ids-from-EMLO.txt: $(date)"
 echo "Created $DATADIR/geonames-ids-from-EMLO.txt: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
 
-# For testing: extract selected range of ids:
-# head -n ${SELECT} $DATADIR/geonames-ids-from-EMLO.txt \
-#     >$DATADIR/geonames-ids-from-EMLO-${SELECT}.txt
-
-sed -n "${FROM},${TO}p" $DATADIR/geonames-ids-from-EMLO.txt \
-    >$DATADIR/geonames-ids-from-EMLO-${SELECT}.txt
-
-echo "Created $DATADIR/geonames-ids-from-EMLO-${SELECT}.txt: $(date)"
-echo "Created $DATADIR/geonames-ids-from-EMLO-${SELECT}.txt: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
-
 # Find all admin hierarchy ids in GeoNames
 python get_geonames_data.py manyplacehierarchy \
-    <$DATADIR/geonames-ids-from-EMLO-${SELECT}.txt \
-    >$DATADIR/geonames-ids-from-EMLO-with-hierarchy-${SELECT}.txt
+    <$DATADIR/geonames-ids-from-EMLO.txt \
+    >$DATADIR/geonames-ids-from-EMLO-with-hierarchy.txt
 
-echo "Created $DATADIR/geonames-ids-from-EMLO-with-hierarchy-${SELECT}.txt: $(date)"
-echo "Created $DATADIR/geonames-ids-from-EMLO-with-hierarchy-${SELECT}.txt: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
+echo "Created $DATADIR/geonames-ids-from-EMLO-with-hierarchy.txt: $(date)"
+echo "Created $DATADIR/geonames-ids-from-EMLO-with-hierarchy.txt: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
 
-# Retrieve GeoNames data and reformat for EMPlaces
+# Retrieve GeoNames data and reformat for EMPlaces, using $WORKERS worker 
+# processes.  (Use '--chunk-dir' to keep the output from each worker in a 
+# separate file.)
 python get_geonames_data.py manygetgeo \
+    --workers $WORKERS --skolemize \
     --include-common-defs --include-emplaces-defs \
     --include-geonames-defs --include-language-defs \
-    <$DATADIR/geonames-ids-from-EMLO-with-hierarchy-${SELECT}.txt \
-    >$DATADIR/geonames-data-ref-by-EMLO-${SELECT}.ttl
+    <$DATADIR/geonames-ids-from-EMLO-with-hierarchy.txt \
+    >$DATADIR/geonames-data-ref-by-EMLO.ttl
 
-echo "Created $DATADIR/geonames-data-ref-by-EMLO-${SELECT}.ttl: $(date)"
-echo "Created $DATADIR/geonames-data-ref-by-EMLO-${SELECT}.ttl: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
+echo "Created $DATADIR/geonames-data-ref-by-EMLO.ttl: $(date)"
+echo "Created $DATADIR/geonames-data-ref-by-EMLO.ttl: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
 
 echo "Data extraction ends: $(date)" >> $DATADIR/geonames-ids-from-EMLO.log
 
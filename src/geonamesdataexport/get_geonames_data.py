@@ -21,7 +21,13 @@ import logging
 import errno
 import json
 import requests
+import threading
+import collections
 import datetime
+import zlib
+import shutil
+import tempfile
+import multiprocessing
 
 from rdflib         import Graph, Namespace, URIRef, Literal, BNode, RDF, RDFS
 from rdflib.paths   import Path
@@ -35,8 +41,24 @@ sys.path.insert(0, gcdroot)
 sys.path.insert(0, comroot)
 
 from commondataexport.getargvalue    import getargvalue, getarg
+from commondataexport.http_transport import (
+    configure_http_transport, RetryPolicy, RateLimiter, parse_host_rates,
+    DEFAULT_MAX_RETRIES
+    )
+from commondataexport.disk_cache     import set_disk_cache_dir, CACHE_DIR_ENV
+from commondataexport.graph_cache    import (
+    LRUGraphCache, set_graph_cache_limits, log_graph_cache_stats,
+    DEFAULT_MAX_ENTRIES
+    )
+from commondataexport.geonames_dump  import (
+    GeoNamesDump, set_geonames_dump, get_geonames_dump
+    )
+from commondataexport.fetch_engine   import (
+    SerialFetchEngine, ThreadPoolFetchEngine, HostLimitedFetchEngine,
+    set_fetch_engine, get_fetch_engine, parse_host_limits
+    )
 from commondataexport.dataextractmap import (
-    DataExtractMap, find_entity_url, make_query_url, http_get_json
+    DataExtractMap, make_query_url, http_get_json
     )
 from commondataexport.emplaces_defs  import (
     SKOS, XSD, SCHEMA, OA, CC, DCTERMS, FOAF, BIBO,
@@ -51,12 +73,22 @@ from commondataexport.emplaces_defs  import (
     add_emplaces_common_namespaces
     )
 
+from commondataexport.progress_journal import ProgressJournal, error_text
+from commondataexport.wikidata_api   import (
+    WikidataEntityStore, set_wikidata_entity_store, get_wikidata_entity_store,
+    WIKIDATA_API_BATCH_SIZE
+    )
+from commondataexport.rdf_stream_writer import (
+    RDFStreamWriter, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT
+    )
 from commondataexport.rdf_data_utils import (
     progname, show_error,
     get_emplaces_id, get_emplaces_id_uri_node, get_emplaces_uri_node, get_many_inputs,
     get_rdf_graph, get_geonames_graph_data,
-    add_turtle_data, add_resource_attributes,
-    get_geonames_place_type_id, get_geonames_place_type_label, 
+    get_rdf_resource, 
+    add_turtle_data, add_graph_data, add_resource_attributes, skolemize_graph,
+    get_geonames_place_type_id, get_geonames_place_type_labels, 
+    get_geonames_place_type_label, 
     format_id_name, format_id_text
     )
 
@@ -83,6 +115,21 @@ GCD_SOME_GEONAMES_URLS  = 8         # Some but not all all URLs matched GeoNames
 GCD_NO_WIKIDATA_IDS     = 9         # No Wikidata Ids for GeoNames ID
 GCD_MANY_WIKIDATA_IDS   = 10        # Multiple Wikidata Ids for GeoNames ID
 
+#   Number of Wikidata Ids fetched before their data is written, with '--stream'
+
+STREAM_BATCH_SIZE = 100
+
+#   Wikidata properties used by the Wikidata place data mapping
+#   (see `get_wikidata_sourced_place_mapping`)
+
+WIKIDATA_PLACE_PROPERTIES = (
+    [ "P244", "P268", "P227", "P1566", "P1667", "P1871", "P2503", "P6060"
+    ])
+
+#   Number of GeoNames Ids resolved by each Wikidata SPARQL query
+
+WIKIDATA_QUERY_BATCH_SIZE = 200
+
 #   ===================================================================
 #
 #   RDF mapping data
@@ -91,13 +138,20 @@ GCD_MANY_WIKIDATA_IDS   = 10        # Multiple Wikidata Ids for GeoNames ID
 
 M = DataExtractMap
 
-def get_geonames_source_reference_mapping(emp_id_sourced, geonames_url, place_label):
-    geonames_link_node      = URIRef(geonames_url)
-    geonames_source_node    = URIRef(EMS[emp_id_sourced])
-    geonames_source_label   = Literal("GeoNames data for %s"%(place_label,))
+#   The GeoNames mapping tables are built just once, using parameter slots
+#   (see `DataExtractMap.param`) for values that differ between places.  
+#   Parameter values for each place are assembled by `get_geonames_place_params`.
+#
+#   The source reference and time period mappings are shared by several of the 
+#   tables, so that each is mapped just once for a place (see `DataExtractMap`).
+
+def get_geonames_source_reference_mapping():
+    geonames_link_node      = M.param_uri("%(geonames_url)s")
+    geonames_source_node    = M.param_uri(EMS["%(emp_id_geonames)s"])
+    geonames_source_label   = M.param_literal("GeoNames data for %(place_label)s")
     geonames_source_tag     = Literal("GeoNames")
-    geonames_source_descr   = Literal("Data from GeoNames URL %s"%(geonames_url,))
-    geonames_access_date    = Literal(datetime.date.today().isoformat())
+    geonames_source_descr   = M.param_literal("Data from GeoNames URL %(geonames_url)s")
+    geonames_access_date    = M.param("access_date")
     geonames_source_mapping = M.emit(
         M.stmt_gen(EM.source, geonames_source_node), M.loc_subgraph(
             M.tgt_subj, M.src_prop, M.src_obj,
@@ -113,17 +167,16 @@ def get_geonames_source_reference_mapping(emp_id_sourced, geonames_url, place_la
         )
     return geonames_source_mapping
 
-def get_when_current_mapping(place_year):
-    period_id        = "Current_%d"%place_year
-    period_label     = Literal("Current, as of %d"%place_year)
-    short_label      = Literal(str(place_year))
-    year_node        = Literal(str(place_year))
-    period_node      = URIRef(EMP[period_id])
-    period_comment   = Literal("Time period including the year %d"%place_year)
-    timespan_node    = URIRef(EMT[period_id])
-    timespan_comment = Literal(
-        ("Timespan starting no later than %d, "%place_year) +
-        ("and ending no sooner than %d"%place_year)
+def get_when_current_mapping():
+    period_label     = M.param_literal("Current, as of %(year)d")
+    short_label      = M.param_literal("%(year)d")
+    year_node        = M.param_literal("%(year)d")
+    period_node      = M.param_uri(EMP["Current_%(year)d"])
+    period_comment   = M.param_literal("Time period including the year %(year)d")
+    timespan_node    = M.param_uri(EMT["Current_%(year)d"])
+    timespan_comment = M.param_literal(
+        "Timespan starting no later than %(year)d, "
+        "and ending no sooner than %(year)d"
         )
     when_current_mapping = M.emit(
         M.stmt_gen(EM.when, period_node), M.loc_subgraph(
@@ -145,15 +198,13 @@ def get_when_current_mapping(place_year):
         )
     return when_current_mapping
 
-def get_geonames_merged_place_mapping(
-    emp_id_merged, emp_id_sourced, source_uri, place_name
-    ):
-    emp_node_merged  = URIRef(PLACE[emp_id_merged])
-    emp_node_sourced = URIRef(PLACE[emp_id_sourced])
-    source_uri_node  = URIRef(source_uri)
-    source_uri_label = Literal("GeoNames URI for %s"%(place_name,))
+def get_geonames_merged_place_mapping():
+    emp_node_merged  = M.param_uri(PLACE["%(emp_id_merged)s"])
+    emp_node_sourced = M.param_uri(PLACE["%(emp_id_geonames)s"])
+    source_uri_node  = M.param_uri("%(geonames_uri)s")
+    source_uri_label = M.param_literal("GeoNames URI for %(place_name)s")
     merged_place_mapping = (
-        [ M.set_subj(M.stmt_gen(EM.dummy_prop),                M.const(emp_node_merged))
+        [ M.set_subj(M.stmt_gen(EM.dummy_prop),                emp_node_merged)
         , M.emit(M.stmt_gen(RDF.type, EM.Place),               M.stmt_copy())
         , M.emit(M.stmt_gen(RDF.type, EM.Place_merged),        M.stmt_copy())
         , M.emit(M.stmt_gen(EM.canonicalURI, emp_node_merged), M.stmt_copy())
@@ -167,44 +218,29 @@ def get_geonames_merged_place_mapping(
         ])
     return merged_place_mapping
 
-def get_geonames_sourced_place_mapping(
-    emp_id_sourced, geonames_url, 
-    place_category, place_type, place_name, place_label, place_country,
-    place_altnames, place_displaynames, place_seeAlso
-    ):
-    geonames_link_node     = URIRef(geonames_url)
-    geonames_source_node   = URIRef(PLACE[emp_id_sourced])
-    geonames_source_label  = Literal("GeoNames data for %s"%(place_name,))
-    geonames_source_tag    = Literal("GeoNames")
+def get_geonames_sourced_place_mapping(source_reference_mapping):
+    geonames_link_node     = M.param_uri("%(geonames_url)s")
+    geonames_source_node   = M.param_uri(PLACE["%(emp_id_geonames)s"])
     geonames_place_mapping = (
-        [ M.set_subj(M.stmt_gen(EM.dummy_prop), M.const(geonames_source_node))
-        , M.emit(M.stmt_gen(RDF.type, EM.Place),                   M.stmt_copy())
-        , M.emit(M.stmt_gen(RDF.type, EM.Place_sourced),           M.stmt_copy())
-        , M.emit(M.stmt_gen(RDFS.label, place_label),              M.stmt_copy())
-        , M.emit(M.stmt_gen(RDFS.isDefinedBy, geonames_link_node), M.stmt_copy())
-        , M.emit(M.stmt_gen(EM.placeCategory, place_category),     M.stmt_copy())
-        , M.emit(M.stmt_gen(EM.placeType, place_type),             M.stmt_copy())
-        , M.emit(M.stmt_gen(EM.preferredName, place_name),         M.stmt_copy())
-        , M.emit(M.stmt_gen(GN.countryCode, place_country),        M.stmt_copy())
-        , get_geonames_source_reference_mapping(emp_id_sourced, geonames_url, place_label)
-        ] +
-        [ M.emit(M.stmt_gen(EM.alternateName, an), M.stmt_copy())
-          for an in place_altnames
-        ] +
-        [ M.emit(M.stmt_gen(EM.displayName, dn), M.stmt_copy())
-          for dn in place_displaynames
-        ] +
-        [ M.emit(M.stmt_gen(RDFS.seeAlso, sa), M.stmt_copy())
-          for sa in place_seeAlso
+        [ M.set_subj(M.stmt_gen(EM.dummy_prop), geonames_source_node)
+        , M.emit(M.stmt_gen(RDF.type, EM.Place),                              M.stmt_copy())
+        , M.emit(M.stmt_gen(RDF.type, EM.Place_sourced),                      M.stmt_copy())
+        , M.emit(M.stmt_gen(RDFS.label, M.param("place_label")),              M.stmt_copy())
+        , M.emit(M.stmt_gen(RDFS.isDefinedBy, geonames_link_node),            M.stmt_copy())
+        , M.emit(M.stmt_gen(EM.placeCategory, M.param("place_category")),     M.stmt_copy())
+        , M.emit(M.stmt_gen(EM.placeType, M.param("place_type")),             M.stmt_copy())
+        , M.emit(M.stmt_gen(EM.preferredName, M.param("place_name")),         M.stmt_copy())
+        , M.emit(M.stmt_gen(GN.countryCode, M.param("place_country")),        M.stmt_copy())
+        , source_reference_mapping
+        , M.emit(M.param_values(EM.alternateName, "place_altnames"),          M.stmt_copy())
+        , M.emit(M.param_values(EM.displayName, "place_displaynames"),        M.stmt_copy())
+        , M.emit(M.param_values(RDFS.seeAlso, "place_seeAlso"),               M.stmt_copy())
         ])
     return geonames_place_mapping
 
-def get_geonames_setting_mapping(
-    emp_id_sourced, geonames_url, place_label,
-    place_lat, place_long, place_year
-    ):
-    place_lat_node  = Literal(str(place_lat),  datatype=XSD.double)
-    place_long_node = Literal(str(place_long), datatype=XSD.double)
+def get_geonames_setting_mapping(when_current_mapping, source_reference_mapping):
+    place_lat_node  = M.param_literal("%(place_lat)s",  datatype=XSD.double)
+    place_long_node = M.param_literal("%(place_long)s", datatype=XSD.double)
     geonames_setting_mapping = (
         [ M.emit(M.stmt_gen(EM.setting), M.loc_subgraph(
             M.tgt_subj, M.src_prop, M.src_obj, # M.src_obj -> BNode from M.stmt_gen 
@@ -216,45 +252,37 @@ def get_geonames_setting_mapping(
                 ]
                 ))
             # Qualifications
-            , get_when_current_mapping(place_year)
-            , get_geonames_source_reference_mapping(emp_id_sourced, geonames_url, place_label)
+            , when_current_mapping
+            , source_reference_mapping
             ]))
         ])
     return geonames_setting_mapping
 
 def get_geonames_place_relation_mapping(
-    emp_id_geonames, geonames_url, place_label,
-    relation_type, parent_geonames_uri, 
-    relation_year, relation_competence
+    relation_type, relation_competence, 
+    when_current_mapping, source_reference_mapping
     ):
-    parent_geonames_id = get_geonames_id(str(parent_geonames_uri))
-    parent_gn_node, parent_gn_rdf = get_geonames_place_rdf(parent_geonames_id)
-    parent_type = parent_gn_rdf[parent_gn_node:GN.featureCode:].next()
-    parent_name = parent_gn_rdf[parent_gn_node:GN.name:].next()
-    emp_parent_id = get_emplaces_id(
-        parent_name, parent_type, parent_geonames_id, suffix="_geonames"
-        )
-    emp_parent_node = URIRef(PLACE[emp_parent_id])
     place_relation_mapping = (
         [ M.emit(M.stmt_gen(EM.hasRelation), M.loc_subgraph(
             M.tgt_subj, M.src_prop, M.src_obj, # M.src_obj -> BNode from M.stmt_gen 
-            [ M.emit(M.stmt_gen(RDF.type, EM.Qualified_relation),     M.stmt_copy())
-            , M.emit(M.stmt_gen(EM.relationType, relation_type),      M.stmt_copy())
-            , M.emit(M.stmt_gen(EM.relationTo, emp_parent_node),      M.stmt_copy())
+            [ M.emit(M.stmt_gen(RDF.type, EM.Qualified_relation),         M.stmt_copy())
+            , M.emit(M.stmt_gen(EM.relationType, relation_type),          M.stmt_copy())
+            , M.emit(M.stmt_gen(EM.relationTo, M.param("emp_parent_node")), M.stmt_copy())
             # Qualifications
-            , M.emit(M.stmt_gen(EM.competence, relation_competence),  M.stmt_copy())
-            , get_when_current_mapping(relation_year)
-            , get_geonames_source_reference_mapping(emp_id_geonames, geonames_url, place_label)
+            , M.emit(M.stmt_gen(EM.competence, relation_competence),      M.stmt_copy())
+            , when_current_mapping
+            , source_reference_mapping
             ]))
         ])
     return place_relation_mapping
 
 def get_place_map_resource_mapping(
-    emp_id_geonames, geonames_url, place_label,
-    map_short_label, map_label, map_url, map_preview_url,
-    map_year, map_competence
+    map_short_label, map_competence,
+    when_current_mapping, source_reference_mapping
     ):
-    emp_node_geonames = URIRef(PLACE[emp_id_geonames])
+    emp_node_geonames = M.param_uri(PLACE["%(emp_id_geonames)s"])
+    map_label         = M.param_literal("Current map for %(place_name)s")
+    map_url           = M.param("place_map")
     place_map_resource_mapping = (
         [ M.emit(M.stmt_gen(EM.hasAnnotation), M.loc_subgraph(
             M.tgt_subj, M.src_prop, M.src_obj, # M.src_obj -> BNode from M.stmt_gen 
@@ -267,25 +295,95 @@ def get_place_map_resource_mapping(
                 , M.emit(M.stmt_gen(RDFS.comment,   map_label),       M.stmt_copy())
                 , M.emit(M.stmt_gen(EM.short_label, map_short_label), M.stmt_copy())
                 , M.emit(M.stmt_gen(EM.preview,     map_url),         M.stmt_copy())
-                , M.emit(M.stmt_gen(EM.link,        map_preview_url), M.stmt_copy())
+                , M.emit(M.stmt_gen(EM.link,        map_url),         M.stmt_copy())
                 ]))
             # Qualifications
             , M.emit(M.stmt_gen(EM.competence, map_competence),  M.stmt_copy())
-            , get_when_current_mapping(map_year)
-            , get_geonames_source_reference_mapping(emp_id_geonames, geonames_url, place_label)
+            , when_current_mapping
+            , source_reference_mapping
             ]))
         ])
     return place_map_resource_mapping
 
-def get_wikidata_merged_place_mapping(
-    emp_id_merged, emp_id_sourced, source_uri, place_name
+def get_geonames_place_mapping():
+    """
+    Returns a mapping table for GeoNames place data, which is used with parameters 
+    returned by `get_geonames_place_params`.
+    """
+    source_reference_mapping = get_geonames_source_reference_mapping()
+    when_current_mapping     = get_when_current_mapping()
+    geonames_place_mapping = (
+        get_geonames_merged_place_mapping() +
+        get_geonames_sourced_place_mapping(source_reference_mapping) +
+        get_geonames_setting_mapping(when_current_mapping, source_reference_mapping) +
+        get_geonames_place_relation_mapping(
+            EM.P_PART_OF_A, EM.DEFINITIVE, 
+            when_current_mapping, source_reference_mapping
+            ) +
+        get_place_map_resource_mapping(
+            Literal("Current"), EM.DEFINITIVE,
+            when_current_mapping, source_reference_mapping
+            )
+        )
+    return geonames_place_mapping
+
+GEONAMES_PLACE_MAPPING = get_geonames_place_mapping()
+GEONAMES_PLACE_PLAN    = M.compile_map(GEONAMES_PLACE_MAPPING)
+
+def get_geonames_parent_node(parent_geonames_uri):
+    """
+    Returns the EMPlaces node for a GeoNames parent place.
+    """
+    parent_geonames_id = get_geonames_id(str(parent_geonames_uri))
+    parent_gn_node, parent_gn_rdf = get_geonames_place_rdf(parent_geonames_id)
+    parent_type = parent_gn_rdf[parent_gn_node:GN.featureCode:].next()
+    parent_name = parent_gn_rdf[parent_gn_node:GN.name:].next()
+    emp_parent_id = get_emplaces_id(
+        parent_name, parent_type, parent_geonames_id, suffix="_geonames"
+        )
+    return URIRef(PLACE[emp_parent_id])
+
+def get_geonames_place_params(
+    emp_id_merged, emp_id_geonames, geonames_uri, geonames_url,
+    place_category, place_type, place_name, place_label, place_country,
+    place_altnames, place_displaynames, place_seeAlso,
+    place_lat, place_long, place_parent, place_map, place_year
     ):
-    emp_node_merged  = URIRef(PLACE[emp_id_merged])
-    emp_node_sourced = URIRef(PLACE[emp_id_sourced])
-    source_uri_node  = URIRef(source_uri)
-    source_uri_label = Literal("WikiData URI for %s"%(place_name,))
+    """
+    Returns a dictionary of parameter values used with GEONAMES_PLACE_MAPPING.
+    """
+    geonames_place_params = (
+        { "emp_id_merged":      emp_id_merged
+        , "emp_id_geonames":    emp_id_geonames
+        , "geonames_uri":       geonames_uri
+        , "geonames_url":       geonames_url
+        , "place_category":     place_category
+        , "place_type":         place_type
+        , "place_name":         place_name
+        , "place_label":        place_label
+        , "place_country":      place_country
+        , "place_altnames":     place_altnames
+        , "place_displaynames": place_displaynames
+        , "place_seeAlso":      place_seeAlso
+        , "place_lat":          place_lat
+        , "place_long":         place_long
+        , "emp_parent_node":    get_geonames_parent_node(place_parent)
+        , "place_map":          place_map
+        , "year":               place_year
+        , "access_date":        Literal(datetime.date.today().isoformat())
+        })
+    return geonames_place_params
+
+#   The Wikidata mapping tables are likewise built just once, and used with
+#   parameter values for each place assembled by `get_wikidata_place_params`.
+
+def get_wikidata_merged_place_mapping():
+    emp_node_merged  = M.param_uri(PLACE["%(emp_id_merged)s"])
+    emp_node_sourced = M.param_uri(PLACE["%(emp_id_wikidata)s"])
+    source_uri_node  = M.param_uri("%(wikidata_url)s")
+    source_uri_label = M.param_literal("WikiData URI for %(place_name)s")
     merged_place_mapping = (
-        [ M.set_subj(M.stmt_gen(EM.dummy_prop), M.const(emp_node_merged))
+        [ M.set_subj(M.stmt_gen(EM.dummy_prop),                emp_node_merged)
         , M.emit(M.stmt_gen(RDF.type, EM.Place),               M.stmt_copy())
         , M.emit(M.stmt_gen(RDF.type, EM.Place_merged),        M.stmt_copy())
         , M.emit(M.stmt_gen(EM.canonicalURI, emp_node_merged), M.stmt_copy())
@@ -299,7 +397,7 @@ def get_wikidata_merged_place_mapping(
         ])
     return merged_place_mapping
 
-def get_wikidata_sourced_place_mapping(emp_id_sourced, wikidata_url):
+def get_wikidata_sourced_place_mapping():
     def alt_authority(
         auth_ref_template, auth_tag, auth_label, auth_descr, 
         auth_id=None, auth_link=None
@@ -315,9 +413,9 @@ def get_wikidata_sourced_place_mapping(emp_id_sourced, wikidata_url):
             , M.emit(M.stmt_gen(EM.id), M.stmt_copy_val(M.ref_src_obj))
             , M.emit(M.stmt_gen_link(EM.link,     auth_link),           M.stmt_copy())
             ])
-    emp_node_sourced = URIRef(PLACE[emp_id_sourced])
+    emp_node_sourced = M.param_uri(PLACE["%(emp_id_wikidata)s"])
     wikidata_data_mapping = (
-        [ M.set_subj(M.stmt_gen(EM.dummy_prop),            M.const(emp_node_sourced))
+        [ M.set_subj(M.stmt_gen(EM.dummy_prop),            emp_node_sourced)
         , M.emit(M.stmt_gen(RDF.type,   EM.Place),         M.stmt_copy())
         , M.emit(M.stmt_gen(RDF.type,   EM.Place_sourced), M.stmt_copy())
         # , M.emit(M.prop_eq(RDFS.label),                    M.stmt_copy())
@@ -396,6 +494,24 @@ def get_wikidata_sourced_place_mapping(emp_id_sourced, wikidata_url):
         ])
     return wikidata_data_mapping
 
+def get_wikidata_place_params(emp_id_merged, emp_id_wikidata, wikidata_url, place_name):
+    """
+    Returns a dictionary of parameter values used with WIKIDATA_PLACE_MAPPING.
+    """
+    wikidata_place_params = (
+        { "emp_id_merged":      emp_id_merged
+        , "emp_id_wikidata":    emp_id_wikidata
+        , "wikidata_url":       wikidata_url
+        , "place_name":         place_name
+        })
+    return wikidata_place_params
+
+WIKIDATA_PLACE_MAPPING = (
+    get_wikidata_merged_place_mapping() + 
+    get_wikidata_sourced_place_mapping()
+    )
+WIKIDATA_PLACE_PLAN    = M.compile_map(WIKIDATA_PLACE_MAPPING)
+
 # @@NOTE: Pleides missing; see: 
 #   http://pleiades.stoa.org/places/442810/darmc-location-18693
 #   https://www.wikidata.org/wiki/Property:P1584
@@ -483,6 +599,197 @@ def parseCommandArgs(argv):
                              "defintions in the output graph."+
                              ""
                         )
+    parser.add_argument("--http-pool-size",
+                        type=int,
+                        dest="http_pool_size",
+                        default=None,
+                        help="Maximum number of keep-alive HTTP connections "+
+                             "maintained for each host accessed."+
+                             ""
+                        )
+    parser.add_argument("--http-timeout",
+                        type=float,
+                        dest="http_timeout",
+                        default=None,
+                        help="Time in seconds to wait for response data "+
+                             "from an HTTP request."+
+                             ""
+                        )
+    parser.add_argument("--max-retries",
+                        type=int,
+                        dest="max_retries",
+                        default=DEFAULT_MAX_RETRIES,
+                        help="Number of times a failed or throttled HTTP request "+
+                             "is retried, with exponential backoff.  "+
+                             "Default %d."%(DEFAULT_MAX_RETRIES,)+
+                             ""
+                        )
+    parser.add_argument("--rate",
+                        action="append",
+                        dest="host_rates",
+                        default=[],
+                        metavar="HOST=RPS",
+                        help="Sets the maximum rate of HTTP requests to HOST, in "+
+                             "requests per second.  May be repeated.  The rate is "+
+                             "reduced automatically if the host throttles requests."+
+                             ""
+                        )
+    parser.add_argument("--prefetch-threads",
+                        type=int,
+                        dest="prefetch_threads",
+                        default=4,
+                        help="Number of threads used to prefetch GeoNames data "+
+                             "for bulk commands, with '--fetch-engine threads'.  "+
+                             "Use 0 to disable prefetching."+
+                             ""
+                        )
+    parser.add_argument("--fetch-engine",
+                        choices=["threads", "hosts"],
+                        dest="fetch_engine",
+                        default="threads",
+                        help="Selects how bulk commands run concurrent fetches: "+
+                             "'threads' uses a single pool of '--prefetch-threads' threads; "+
+                             "'hosts' applies a separate concurrency limit to each "+
+                             "host accessed (see '--host-limit')."+
+                             ""
+                        )
+    parser.add_argument("--host-limit",
+                        action="append",
+                        dest="host_limits",
+                        default=[],
+                        metavar="HOST=N",
+                        help="With '--fetch-engine hosts', sets the maximum number "+
+                             "of concurrent requests to HOST.  May be repeated."+
+                             ""
+                        )
+    parser.add_argument("--cache-dir",
+                        dest="cache_dir",
+                        default=None,
+                        metavar="DIR",
+                        help="Directory used to cache retrieved web resources.  "+
+                             "Defaults to the value of environment variable "+
+                             CACHE_DIR_ENV+", or '~/.emplaces/rdf_data_cache'."+
+                             ""
+                        )
+    parser.add_argument("--geonames-dump",
+                        dest="geonames_dump",
+                        default=None,
+                        metavar="DIR",
+                        help="Directory containing GeoNames dump files (allCountries.txt, "+
+                             "alternateNamesV2.txt, hierarchy.txt and countryInfo.txt), "+
+                             "which are used instead of retrieving place data "+
+                             "from sws.geonames.org.  Index files are created "+
+                             "alongside the dump files when first used."+
+                             ""
+                        )
+    parser.add_argument("--graph-cache-size",
+                        type=int,
+                        dest="graph_cache_size",
+                        default=DEFAULT_MAX_ENTRIES,
+                        help="Maximum number of parsed graphs held in memory "+
+                             "by each in-memory graph cache.  Default %d."%(DEFAULT_MAX_ENTRIES,)+
+                             ""
+                        )
+    parser.add_argument("--graph-cache-triples",
+                        type=int,
+                        dest="graph_cache_triples",
+                        default=None,
+                        help="Maximum total number of triples held in memory "+
+                             "by each in-memory graph cache.  Default: no limit."+
+                             ""
+                        )
+    parser.add_argument("--revalidate",
+                        action="store_true",
+                        dest="revalidate",
+                        default=False,
+                        help="Check cached web resources with the originating "+
+                             "server (using ETag and Last-Modified validators), "+
+                             "and retrieve again any that have changed."+
+                             ""
+                        )
+    parser.add_argument("--skolemize",
+                        action="store_true",
+                        dest="skolemize",
+                        default=False,
+                        help="Use IRIs derived from the generated data in place of "+
+                             "blank nodes for place settings, relations, annotations, "+
+                             "etc., so that the same data always yields the same "+
+                             "output, and output from separate runs can be merged."+
+                             ""
+                        )
+    parser.add_argument("--workers",
+                        type=int,
+                        dest="workers",
+                        default=1,
+                        help="Number of worker processes used by 'manygetgeonamesdata'.  "+
+                             "Place Ids are divided among the workers by a hash of "+
+                             "each Id, and the output from all workers is merged.  "+
+                             "The request rate limit for each host (see '--rate') "+
+                             "is divided equally among the workers.  "+
+                             "Default 1 (no separate workers)."+
+                             ""
+                        )
+    parser.add_argument("--chunk-dir",
+                        dest="chunk_dir", metavar="DIR",
+                        default=None,
+                        help="With '--workers', write the output from each worker "+
+                             "to a separate Turtle file in DIR, rather than merging "+
+                             "it, and list the files written on standard output."+
+                             ""
+                        )
+    parser.add_argument("--stream",
+                        action="store_true",
+                        dest="stream",
+                        default=False,
+                        help="For bulk commands, write the data for each place as "+
+                             "soon as it has been generated, rather than when all "+
+                             "places have been processed."+
+                             ""
+                        )
+    parser.add_argument("--output-format",
+                        choices=sorted(OUTPUT_FORMATS.keys()),
+                        dest="output_format",
+                        default=DEFAULT_OUTPUT_FORMAT,
+                        help="Format of RDF data written: 'turtle' (default) or "+
+                             "'ntriples'.  With '--stream', Turtle output is written "+
+                             "as a block for each place, using common prefix "+
+                             "declarations written at the start of the output."+
+                             ""
+                        )
+    parser.add_argument("--wikidata-api",
+                        action="store_true",
+                        dest="wikidata_api",
+                        default=False,
+                        help="Retrieve Wikidata place data and Wikipedia article "+
+                             "references using the Wikidata API, for up to %d places "%(WIKIDATA_API_BATCH_SIZE,)+
+                             "with each request, rather than retrieving the full RDF "+
+                             "data for each place."+
+                             ""
+                        )
+    parser.add_argument("--journal",
+                        dest="journal", metavar="FILE",
+                        default=None,
+                        help="For bulk commands, record in SQLite database FILE "+
+                             "whether each Id has been done, or has failed (and "+
+                             "why), and the output chunk in which its data was written."+
+                             ""
+                        )
+    parser.add_argument("--resume",
+                        action="store_true",
+                        dest="resume",
+                        default=False,
+                        help="With '--journal', skip Ids that have already been "+
+                             "done by an earlier run."+
+                             ""
+                        )
+    parser.add_argument("--retry-failed",
+                        action="store_true",
+                        dest="retry_failed",
+                        default=False,
+                        help="With '--journal', process only Ids that failed in "+
+                             "an earlier run."+
+                             ""
+                        )
     parser.add_argument("command", metavar="COMMAND",
                         nargs=None,
                         help="sub-command, one of the options listed below."
@@ -493,6 +800,9 @@ def parseCommandArgs(argv):
                         )
     # parse command line now
     options = parser.parse_args(argv)
+    if options and (options.resume or options.retry_failed) and not options.journal:
+        print("Options '--resume' and '--retry-failed' require '--journal'", file=sys.stderr)
+        return None
     if options:
         if options and options.command:
             return options
@@ -531,6 +841,20 @@ def show_help(options, progname):
             "for these from GeoNames, and sends corresponding EMPlaces data in\n"+
             "Turtle format to standard output.\n"+
             "\n"+
+            "Before any data is mapped, GeoNames data for all of the places and their\n"+
+            "parent features is fetched concurrently (see option '--prefetch-threads').\n"+
+            "\n"+
+            "With '--workers N', the places are divided among N worker processes, whose\n"+
+            "output is merged (or, with '--chunk-dir', written to separate files).\n"+
+            "Option '--skolemize' allows data from different workers to be merged cleanly.\n"+
+            "\n"+
+            "With '--stream', data for each place is written as soon as it is generated\n"+
+            "(see also option '--output-format').\n"+
+            "\n"+
+            "With '--journal FILE', progress for each place is recorded, so that an\n"+
+            "interrupted run can be continued using '--resume', or places that failed\n"+
+            "can be processed again using '--retry-failed'.\n"+
+            "\n"+
             "To include some common non-place-specific supporting definitions, see options\n"+
             "'--include-common-defs', '--include-emplaces-defs', '--include-geonames-defs', \n"+
             "and '--include-language-defs'.\n"+
@@ -765,33 +1089,75 @@ def get_many_wikidata_ids():
 #
 #   ===================================================================
 
+GEONAMES_ONTOLOGY_FILE = os.path.join(dirhere, "geonames_ontology_v3.1.rdf")
+
+geonames_ontology      = None
+geonames_type_labels   = None
+geonames_ontology_lock = threading.Lock()
+
 def get_geonames_ontology():
     """
-    Return Graph of GeoNames ontology data
-    """
-    geo_ont_url  = "http://www.geonames.org/ontology/ontology_v3.1.rdf"
-    geo_ont_rdf  = get_geonames_graph_data(geo_ont_url)
-    return geo_ont_rdf
+    Return Graph of GeoNames ontology data.
 
-geonames_cache = {}     # Don't get data if we've already retrieved it.
+    The ontology is read from the copy of "ontology_v3.1.rdf" distributed with
+    this software, just once for each run of the program.
+    """
+    global geonames_ontology
+    with geonames_ontology_lock:
+        if geonames_ontology is None:
+            geo_ont_url       = "file://" + GEONAMES_ONTOLOGY_FILE
+            geonames_ontology = get_geonames_graph_data(geo_ont_url)
+    return geonames_ontology
+
+def get_geonames_type_labels():
+    """
+    Return dictionary of labels for GeoNames place types (feature codes),
+    which is built just once from the GeoNames ontology.
+    """
+    global geonames_type_labels
+    if geonames_type_labels is None:
+        type_labels = get_geonames_place_type_labels(get_geonames_ontology())
+        with geonames_ontology_lock:
+            geonames_type_labels = type_labels
+    return geonames_type_labels
+
+geonames_cache = LRUGraphCache("geonames_cache")   # Don't get data if we've already retrieved it.
 def get_geonames_place_data(geonames_url):
     """
-    Returns graph of GeoNames place data
+    Returns graph of GeoNames place data.
+
+    If a GeoNames dump has been selected (see `--geonames-dump`), the data is 
+    obtained from the dump files rather than from sws.geonames.org.
+    """
+    return geonames_cache.get_or_load(geonames_url, get_geonames_url_data)
+
+def get_geonames_url_data(geonames_url):
     """
-    if geonames_url not in geonames_cache:
-        geonames_rdf = get_geonames_graph_data(geonames_url)
-        geonames_cache[geonames_url] = geonames_rdf
-    return geonames_cache[geonames_url]
+    Returns graph of GeoNames place data, from a GeoNames dump if selected,
+    otherwise from the indicated URL.
+    """
+    geonames_dump = get_geonames_dump()
+    if geonames_dump:
+        return geonames_dump.get_place_graph(get_geonames_id(geonames_url))
+    return get_geonames_graph_data(geonames_url)
     # return geonames_rdf
 
 def get_emplaces_geonames_data(
     geonames_id, geonames_uri, geonames_url, 
-    geonames_rdf, geo_ont_rdf,
-    emplaces_rdf=None
+    geonames_rdf, geo_type_labels,
+    emplaces_rdf=None, skolemize=False, memo=None
     ):
     """
     Constructs EMPlaces RDF data from supplied GeoNames place data.
 
+    If `skolemize` is True, blank nodes in the generated data are replaced
+    by IRIs derived from the data (see `skolemize_graph`).
+
+    If `memo` is supplied, it is used to record subgraphs mapped into 
+    `emplaces_rdf` for earlier places (see `DataExtractMap`), so that subgraphs
+    shared by those places are not mapped again.  It is not used with 
+    `skolemize`, as the data for each place is then mapped to a separate graph.
+
     Returns tuple of:
         0. EMPlaces Id for place
         1. EMPlaces URI for place
@@ -815,7 +1181,7 @@ def get_emplaces_geonames_data(
         place_seeAlso      = list(geonames_rdf[geonames_node:(RDFS.seeAlso|GN.wikipediaArticle):])
         place_lat          = geonames_rdf[geonames_node:WGS84_POS.lat:].next()
         place_long         = geonames_rdf[geonames_node:WGS84_POS.long:].next()
-        place_type_label   = get_geonames_place_type_label(place_type, geo_ont_rdf)
+        place_type_label   = get_geonames_place_type_label(place_type, geo_type_labels)
         place_label        = Literal("%s (%s)"%(place_name, place_type_label))
     except Exception as e:
         log.error("Problem accessing data for %s"%(geonames_url,), exc_info=True)
@@ -853,54 +1219,41 @@ def get_emplaces_geonames_data(
     if emplaces_rdf is None:
         emplaces_rdf = Graph()
         add_emplaces_common_namespaces(emplaces_rdf, local_namespaces={})
-    # Assemble mapping tables...
-    merged_place_mapping = get_geonames_merged_place_mapping(
-        emp_id_merged, emp_id_geonames, geonames_uri, place_name
-        )
-    sourced_place_mapping = get_geonames_sourced_place_mapping(
-        emp_id_geonames, geonames_url,
+    # Apply mapping table...
+    place_params = get_geonames_place_params(
+        emp_id_merged, emp_id_geonames, geonames_uri, geonames_url,
         place_category, place_type, place_name, place_label, place_country,
-        place_altnames, place_displaynames, place_seeAlso
-        )
-    place_setting_mapping = get_geonames_setting_mapping(
-        emp_id_geonames, geonames_url, place_label,
-        place_lat, place_long, 2018,
+        place_altnames, place_displaynames, place_seeAlso,
+        place_lat, place_long, place_parent, place_map, 2018
         )
-    place_relation_mapping = get_geonames_place_relation_mapping(
-        emp_id_geonames, geonames_url, place_label,
-        EM.P_PART_OF_A, place_parent, 
-        2018, EM.DEFINITIVE
-        )
-    place_map_resource_mapping = get_place_map_resource_mapping(
-        emp_id_geonames, geonames_url, place_label,
-        Literal("Current"), 
-        Literal("Current map for %s"%(place_name)), 
-        place_map, place_map,
-        2018, EM.DEFINITIVE
-        )
-
-    # Apply mapping tables...
     log.debug("get_emplaces_geonames_data: geonames_uri   %s"%geonames_uri)
-    m = DataExtractMap(geonames_node, geonames_rdf, emplaces_rdf)
-    m.extract_map(merged_place_mapping)
-    m.extract_map(sourced_place_mapping)
-    m.extract_map(place_setting_mapping)
-    m.extract_map(place_relation_mapping)
-    m.extract_map(place_relation_mapping)
-    m.extract_map(place_map_resource_mapping)
+    if skolemize:
+        place_rdf = Graph()
+        m = DataExtractMap(geonames_node, geonames_rdf, place_rdf, params=place_params)
+        m.run_plan(GEONAMES_PLACE_PLAN)
+        skolemize_graph(place_rdf, emplaces_rdf)
+    else:
+        m = DataExtractMap(
+            geonames_node, geonames_rdf, emplaces_rdf, params=place_params, memo=memo
+            )
+        m.run_plan(GEONAMES_PLACE_PLAN)
     return (emp_id_merged, emp_uri_merged, emplaces_rdf)
 
-def get_geonames_id_data(gcdroot, geonames_id, emplaces_rdf=None):
+def get_geonames_id_data(
+    gcdroot, geonames_id, emplaces_rdf=None, skolemize=False, memo=None
+    ):
     """
     Build EMPlaces place data for a specified GeoNames place id.
+
+    See `get_emplaces_geonames_data` for use of `memo`.
     """
     geonames_uri, geonames_url = get_geonames_uri(geonames_id)
     # print("geonames_url: %s"%(geonames_url,), file=sys.stderr)
     geonames_rdf = get_geonames_place_data(geonames_url)
-    geo_ont_rdf  = get_geonames_ontology()
+    geo_type_labels = get_geonames_type_labels()
     emplaces_id, emplaces_uri, emplaces_rdf = get_emplaces_geonames_data(
-        geonames_id, geonames_uri, geonames_url, geonames_rdf, geo_ont_rdf,
-        emplaces_rdf=emplaces_rdf
+        geonames_id, geonames_uri, geonames_url, geonames_rdf, geo_type_labels,
+        emplaces_rdf=emplaces_rdf, skolemize=skolemize, memo=memo
         )
     return emplaces_rdf
 
@@ -913,36 +1266,382 @@ def get_common_defs(options, emplaces_rdf):
         add_turtle_data(emplaces_rdf, COMMON_LANGUAGE_DEFS)
     return emplaces_rdf
 
+def new_emplaces_graph():
+    """
+    Returns a new empty graph with the common EMPlaces namespace bindings.
+    """
+    emplaces_rdf = Graph()
+    add_emplaces_common_namespaces(emplaces_rdf, local_namespaces={})
+    return emplaces_rdf
+
+def print_graph(options, result_rdf):
+    """
+    Write the supplied graph to standard output, in the format selected by
+    option '--output-format'.
+    """
+    print(
+        result_rdf.serialize(format=OUTPUT_FORMATS[options.output_format], indent=4), 
+        file=sys.stdout
+        )
+    return
+
+def get_stream_writer(options, namespace_graph, output=None):
+    """
+    Returns a stream writer for incremental output of data in the format selected
+    by option '--output-format', to the supplied output file or standard output.
+    """
+    return RDFStreamWriter(
+        output or sys.stdout, 
+        format=options.output_format, 
+        namespace_graph=namespace_graph
+        )
+
+def write_common_defs(options, writer):
+    """
+    Write common definitions selected by the command line options to the 
+    supplied stream writer.
+    """
+    defs_rdf = get_common_defs(options, new_emplaces_graph())
+    if len(defs_rdf) > 0:
+        writer.write_graph(defs_rdf)
+    return
+
 def do_get_geonames_place_data(gcdroot, options):
     geonames_id  = getargvalue(getarg(options.args, 0), "GeoNames Id: ")
-    emplaces_rdf = get_geonames_id_data(gcdroot, geonames_id)
+    emplaces_rdf = get_geonames_id_data(gcdroot, geonames_id, skolemize=options.skolemize)
     get_common_defs(options, emplaces_rdf)
-    print(emplaces_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+    print_graph(options, emplaces_rdf)
     return GCD_SUCCESS
 
-def do_get_many_geonames_place_data(gcdroot, options):
+def geonames_place_host(place_id):
     """
-    Read multiple place Ids from standard input, and return a graph of
-    EMPlaces data for all of the identified places.
+    Returns the host accessed to retrieve data for a GeoNames place id.
     """
-    emplaces_rdf = None     # Graph created on first loop below
-    geonames_ids = get_many_geonames_ids()
-    if not geonames_ids:
-        return GCD_NO_GEONAMES_IDS
+    return "sws.geonames.org"
+
+def prefetch_geonames_place_data(geonames_ids):
+    """
+    Retrieve GeoNames data for the supplied place ids, and for their parent 
+    features, using the currently selected fetch engine.
+
+    The retrieved data is held in `geonames_cache` and the RDF data cache, so that
+    subsequent mapping of the places does not wait on network access.  (Graphs
+    evicted from `geonames_cache` are reloaded from the RDF data cache when
+    needed.)  Failures are logged here, and reported again when the affected 
+    place is mapped.
+    """
+    def prefetch_parent_ids(place_id):
+        place_node, place_rdf = get_geonames_place_rdf(place_id)
+        return [ get_geonames_id(str(p)) for p in place_rdf[place_node:GN.parentFeature:] ]
+    def prefetch_places(place_ids):
+        fetched = []
+        for place_id, place_parent_ids, e in get_fetch_engine().map(
+            prefetch_parent_ids, place_ids, geonames_place_host
+            ):
+            if e is None:
+                fetched.append(place_parent_ids)
+            else:
+                log.warning("Prefetch failed for GeoNames Id %s (%s)"%(place_id, e))
+        return fetched
+    seen_ids  = set()
+    place_ids = []
+    for place_id in geonames_ids:
+        if place_id not in seen_ids:
+            seen_ids.add(place_id)
+            place_ids.append(place_id)
+    parent_ids = []
+    for place_parent_ids in prefetch_places(place_ids):
+        for parent_id in place_parent_ids:
+            if parent_id not in seen_ids:
+                seen_ids.add(parent_id)
+                parent_ids.append(parent_id)
+    prefetch_places(parent_ids)
+    log.debug(
+        "prefetch_geonames_place_data: %d places, %d parents"%
+        (len(place_ids), len(parent_ids))
+        )
+    return
+
+def prepare_geonames_place_data(geonames_ids):
+    """
+    Prepare to map data for the supplied GeoNames place Ids, by opening the 
+    GeoNames dump or by prefetching the place data, as configured.
+    """
+    if get_geonames_dump():
+        get_geonames_dump().preload(geonames_ids)
+    elif get_fetch_engine().concurrent:
+        prefetch_geonames_place_data(geonames_ids)
+    return
+
+def open_journal(options, command, run_id=None):
+    """
+    Returns a progress journal for the indicated bulk command, if one has been 
+    selected by option '--journal', otherwise None.
+    """
+    if not options.journal:
+        return None
+    return ProgressJournal(options.journal, command, run_id=run_id)
+
+def get_many_geonames_id_data(gcdroot, geonames_ids, skolemize=False, journal=None):
+    """
+    Returns a graph of EMPlaces data for all of the supplied GeoNames place Ids.
+
+    Errors for individual places are logged (and recorded in the supplied 
+    progress journal, if any), and do not prevent data for other places 
+    from being returned.
+
+    As data for all places is added to a single graph, subgraphs shared by
+    several places (e.g. the current time period) are mapped just once.
+    """
+    emplaces_rdf = new_emplaces_graph()
+    memo         = {}
+    prepare_geonames_place_data(geonames_ids)
     for geonames_id in geonames_ids:
         try:
             emplaces_rdf = get_geonames_id_data(
-                gcdroot, geonames_id, emplaces_rdf=emplaces_rdf
+                gcdroot, geonames_id, emplaces_rdf=emplaces_rdf, 
+                skolemize=skolemize, memo=memo
                 )
         except Exception as e:
             log.error(
                 "Error getting data for GeoNames Id %s"%(geonames_id), 
                 exc_info=True
                 )
-    get_common_defs(options, emplaces_rdf)
-    print(emplaces_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+            if journal:
+                journal.mark_failed(geonames_id, e)
+    return emplaces_rdf
+
+def write_many_geonames_id_data(
+    gcdroot, geonames_ids, writer, skolemize=False, 
+    journal=None, chunk=None, mark_done=True
+    ):
+    """
+    Writes EMPlaces data for each of the supplied GeoNames place Ids to the 
+    supplied stream writer, as soon as it has been generated.
+
+    Errors for individual places are logged, and do not prevent data for other 
+    places from being written.  If a progress journal is supplied, errors are
+    recorded in the journal, as is each place written (with the supplied chunk 
+    name) unless `mark_done` is False.
+
+    The data for each place is mapped separately, and includes any subgraphs
+    it shares with other places, so that each graph written is self-contained.
+    """
+    prepare_geonames_place_data(geonames_ids)
+    for geonames_id in geonames_ids:
+        try:
+            place_rdf = get_geonames_id_data(gcdroot, geonames_id, skolemize=skolemize)
+        except Exception as e:
+            log.error(
+                "Error getting data for GeoNames Id %s"%(geonames_id), 
+                exc_info=True
+                )
+            if journal:
+                journal.mark_failed(geonames_id, e)
+        else:
+            writer.write_graph(place_rdf)
+            if journal and mark_done:
+                journal.mark_done(geonames_id, chunk)
+    return
+
+def partition_geonames_ids(geonames_ids, num_parts):
+    """
+    Partitions a list of GeoNames place Ids into `num_parts` lists, using a hash
+    of each Id so that a given place is always assigned to the same partition.
+    Duplicate Ids are dropped, and the input order is otherwise preserved.
+    """
+    parts = [ [] for _ in range(num_parts) ]
+    seen  = set()
+    for geonames_id in geonames_ids:
+        if geonames_id not in seen:
+            seen.add(geonames_id)
+            h = zlib.crc32(geonames_id.encode("utf-8")) & 0xffffffff
+            parts[h % num_parts].append(geonames_id)
+    return parts
+
+def geonames_worker(worker_args):
+    """
+    Worker process function for `manygetgeonamesdata` with '--workers': maps 
+    the supplied GeoNames place Ids, and writes the resulting data in the
+    selected output format to the indicated chunk file.
+
+    The worker inherits the disk cache, fetch engine and GeoNames dump selected 
+    by the parent process, but uses its own HTTP connections, in-memory graph
+    caches and progress journal connection.  Request rates to each host are
+    divided equally among the workers.  Places are recorded as done in 
+    the journal only when the chunk file is kept (see '--chunk-dir'); otherwise
+    this is left to the parent process when the merged output has been written.
+
+    Returns a tuple of the chunk file name and the number of triples written.
+    """
+    (gcdroot, options, geonames_ids, chunk_file, run_id) = worker_args
+    # Each worker is limited to an equal share of each host's request rate
+    configure_options_http_transport(
+        options, get_fetch_engine(), rate_share=1.0/options.workers
+        )
+    journal   = open_journal(options, "manygetgeonamesdata", run_id=run_id)
+    mark_done = journal is not None and options.chunk_dir is not None
+    with open(chunk_file, "wb") as f:
+        if options.stream:
+            writer = get_stream_writer(options, new_emplaces_graph(), output=f)
+            write_many_geonames_id_data(
+                gcdroot, geonames_ids, writer, skolemize=options.skolemize,
+                journal=journal, chunk=chunk_file, mark_done=mark_done
+                )
+            triple_count = writer.triple_count
+        else:
+            emplaces_rdf = get_many_geonames_id_data(
+                gcdroot, geonames_ids, skolemize=options.skolemize, journal=journal
+                )
+            f.write(
+                emplaces_rdf.serialize(
+                    format=OUTPUT_FORMATS[options.output_format], indent=4
+                    )
+                )
+            triple_count = len(emplaces_rdf)
+    if mark_done and not options.stream:
+        journal.mark_pending_done(geonames_ids, chunk_file)
+    if journal:
+        journal.close()
+    log.info(
+        "Worker %d: %d places, %d triples written to %s"%
+        (os.getpid(), len(geonames_ids), triple_count, chunk_file)
+        )
+    log_graph_cache_stats()
+    return (chunk_file, triple_count)
+
+def get_many_geonames_data_workers(
+    gcdroot, options, geonames_ids, chunk_dir, journal=None
+    ):
+    """
+    Partition the supplied GeoNames place Ids among `options.workers` worker
+    processes, each of which writes EMPlaces data for its places to a separate
+    file in `chunk_dir`.  When a progress journal is used, chunk file names
+    include the journal run number, so that chunks from earlier runs are kept.
+
+    Returns a list of the chunk files written.
+    """
+    if get_geonames_dump():
+        # Build any missing dump indexes once, before the workers are started
+        get_geonames_dump().open()
+    chunk_ext = { "turtle": "ttl", "ntriples": "nt" }[options.output_format]
+    if journal:
+        run_id    = journal.run_id
+        chunk_fmt = "emplaces-r%03d-%%03d.%s"%(run_id, chunk_ext)
+    else:
+        run_id    = None
+        chunk_fmt = "emplaces-%%03d.%s"%(chunk_ext,)
+    parts     = partition_geonames_ids(geonames_ids, options.workers)
+    worker_args = [
+        ( gcdroot, options, part_ids, os.path.join(chunk_dir, chunk_fmt%(n,)), run_id )
+        for n, part_ids in enumerate(parts) if part_ids
+        ]
+    if not worker_args:
+        return []
+    pool = multiprocessing.Pool(processes=len(worker_args))
+    try:
+        results = pool.map(geonames_worker, worker_args)
+    finally:
+        pool.close()
+        pool.join()
+    return [ chunk_file for chunk_file, _ in results ]
+
+def do_get_many_geonames_place_data(gcdroot, options):
+    """
+    Read multiple place Ids from standard input, and return a graph of
+    EMPlaces data for all of the identified places.
+
+    With '--journal', progress is recorded so that an interrupted run can be 
+    resumed (see options '--resume' and '--retry-failed').
+    """
+    geonames_ids = get_many_geonames_ids()
+    if not geonames_ids:
+        return GCD_NO_GEONAMES_IDS
+    journal = open_journal(options, "manygetgeonamesdata")
+    if journal:
+        geonames_ids = journal.start_run(
+            geonames_ids, resume=options.resume, retry_failed=options.retry_failed
+            )
+    try:
+        status = write_many_geonames_place_data(gcdroot, options, geonames_ids, journal)
+    finally:
+        if journal:
+            journal.log_summary()
+            journal.close()
+    return status
+
+def write_many_geonames_place_data(gcdroot, options, geonames_ids, journal):
+    """
+    Write EMPlaces data for the supplied GeoNames place Ids.
+
+    With '--stream', data for each place is written as soon as it is generated.
+
+    With '--workers', the places are handled by separate worker processes, and 
+    their output is merged, or left in separate files if '--chunk-dir' is given.
+    """
+    if options.workers <= 1:
+        if options.stream:
+            writer = get_stream_writer(options, new_emplaces_graph())
+            write_common_defs(options, writer)
+            write_many_geonames_id_data(
+                gcdroot, geonames_ids, writer, skolemize=options.skolemize,
+                journal=journal
+                )
+            writer.close()
+            return GCD_SUCCESS
+        emplaces_rdf = get_many_geonames_id_data(
+            gcdroot, geonames_ids, skolemize=options.skolemize, journal=journal
+            )
+        get_common_defs(options, emplaces_rdf)
+        print_graph(options, emplaces_rdf)
+        if journal:
+            journal.mark_pending_done(geonames_ids)
+        return GCD_SUCCESS
+    if options.chunk_dir:
+        make_chunk_dir(options.chunk_dir)
+        chunk_files = get_many_geonames_data_workers(
+            gcdroot, options, geonames_ids, options.chunk_dir, journal=journal
+            )
+        for chunk_file in chunk_files:
+            print(chunk_file, file=sys.stdout)
+        return GCD_SUCCESS
+    chunk_dir = tempfile.mkdtemp(prefix="emplaces-")
+    try:
+        chunk_files  = get_many_geonames_data_workers(
+            gcdroot, options, geonames_ids, chunk_dir, journal=journal
+            )
+        if options.stream:
+            # Chunk files are copied to the output without parsing them
+            writer = get_stream_writer(options, new_emplaces_graph())
+            write_common_defs(options, writer)
+            writer.close()
+            for chunk_file in chunk_files:
+                with open(chunk_file, "rb") as f:
+                    shutil.copyfileobj(f, sys.stdout)
+            sys.stdout.flush()
+        else:
+            emplaces_rdf = new_emplaces_graph()
+            for chunk_file in chunk_files:
+                emplaces_rdf.parse(chunk_file, format=OUTPUT_FORMATS[options.output_format])
+            get_common_defs(options, emplaces_rdf)
+            print_graph(options, emplaces_rdf)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    if journal:
+        journal.mark_pending_done(geonames_ids)
     return GCD_SUCCESS
 
+def make_chunk_dir(chunk_dir):
+    """
+    Create directory for worker output files, if it does not already exist.
+    """
+    try:
+        os.makedirs(chunk_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return
+
 def get_geonames_place_rdf(place_id):
     log.debug("get_geonames_place_rdf(%s)"%(place_id))
     place_uri, place_url = get_geonames_uri(place_id)
@@ -965,76 +1664,126 @@ def get_geonames_place_name_type_parent(place_node, place_rdf):
         parent_id = None     # No parent place for country
     return (place_name, place_type, parent_id)
 
+ADMIN_PARENT_PROPERTIES = (
+    [ GN.parentADM5
+    , GN.parentADM4
+    , GN.parentADM3
+    , GN.parentADM2
+    , GN.parentADM1
+    , GN.parentCountry
+    ])
+
+def get_place_hierarchy_data(place_id):
+    """
+    Returns a tuple of (place name, place type, parent feature id, admin parent ids)
+    for the indicated place.
+    """
+    place_node, place_rdf = get_geonames_place_rdf(place_id)
+    place_name, place_type, parent_id = (
+        get_geonames_place_name_type_parent(place_node, place_rdf)
+        )
+    admin_parent_ids = (
+        [ get_geonames_id(parent_obj) 
+          for prop in ADMIN_PARENT_PROPERTIES
+          for parent_obj in place_rdf[place_node:prop:]
+        ])
+    return (place_name, place_type, parent_id, admin_parent_ids)
+
+def get_hierarchy_levels(place_ids, hier_ids, get_parent_ids, max_levels=None):
+    """
+    Breadth-first traversal of a place hierarchy.
+
+    Each level (or frontier) of places not already seen is retrieved in a single
+    batch using the currently selected fetch engine, so that places at the same
+    level are retrieved concurrently, and ancestors shared by many places are 
+    retrieved just once.
+
+    place_ids       is a list of GeoNames place ids from which the traversal starts.
+    hier_ids        is a dictionary to which (id, name, type) tuples are added for
+                    each place visited, keyed by place id.
+    get_parent_ids  is a function that returns a list of parent place ids, given
+                    a value returned by `get_place_hierarchy_data`.
+    max_levels      if specified, is the number of levels of parents visited.
+
+    Returns the updated `hier_ids` dictionary.
+    """
+    frontier     = []
+    frontier_ids = set()
+    for place_id in place_ids:
+        if (place_id not in hier_ids) and (place_id not in frontier_ids):
+            frontier_ids.add(place_id)
+            frontier.append(place_id)
+    level = 0
+    while frontier:
+        log.debug("get_hierarchy_levels: level %d, %d places"%(level, len(frontier)))
+        next_frontier = []
+        for place_id, place_data, e in get_fetch_engine().map(
+            get_place_hierarchy_data, frontier, geonames_place_host
+            ):
+            if e is not None:
+                log.error("Error getting hierarchy data for GeoNames Id %s (%s)"%(place_id, e))
+                continue
+            place_name, place_type, parent_id, admin_parent_ids = place_data
+            hier_ids[place_id] = (place_id, place_name, place_type)
+            if (max_levels is None) or (level < max_levels):
+                for parent_id in get_parent_ids(place_data):
+                    if (parent_id not in hier_ids) and (parent_id not in frontier_ids):
+                        frontier_ids.add(parent_id)
+                        next_frontier.append(parent_id)
+        frontier     = next_frontier
+        frontier_ids = set(next_frontier)
+        level       += 1
+    return hier_ids
+
 def get_place_admin_hierarchy(place_ids, hier_ids):
     """
     Reads admin hierarchy places directly out of a place record
 
     This is an alternative to `get_places_hierarchy` which walks the parent featiure
     links up the tree.  We have found the parent links are not always consistent.
+
+    The supplied places are retrieved together, followed by all of their
+    admin parents (ADM5 to country) together.
     """
-    log.debug("get_places_hierarchy(%s, %s)"%(place_ids, hier_ids))
-    admin_parent_properties = (
-        [ GN.parentADM5
-        , GN.parentADM4
-        , GN.parentADM3
-        , GN.parentADM2
-        , GN.parentADM1
-        , GN.parentCountry
-        ])
-    for place_id in place_ids:
-        if place_id not in hier_ids:
-            place_node, place_rdf = get_geonames_place_rdf(place_id)
-            place_name, place_type, parent_id = (
-                get_geonames_place_name_type_parent(place_node, place_rdf)
-                )
-            hier_ids[place_id] = (place_id, place_name, place_type)
-            for prop in admin_parent_properties:
-                for parent_obj in place_rdf[place_node:prop:]:
-                    parent_id = get_geonames_id(parent_obj)
-                    if parent_id not in hier_ids:
-                        log.debug("get_places_hierarchy: parent_id %s"%(parent_id,))
-                        parent_node, parent_rdf = get_geonames_place_rdf(parent_id)
-                        parent_name, parent_type, grandparent_id = (
-                            get_geonames_place_name_type_parent(parent_node, parent_rdf)
-                            )
-                        hier_ids[parent_id] = (parent_id, parent_name, parent_type)
-    return hier_ids
+    log.debug("get_place_admin_hierarchy(%s, %s)"%(place_ids, hier_ids))
+    def admin_parent_ids(place_data):
+        return place_data[3]
+    return get_hierarchy_levels(place_ids, hier_ids, admin_parent_ids, max_levels=1)
 
 def get_places_hierarchy(place_ids, hier_ids):
+    """
+    Walks parent feature links up the tree from the supplied places, 
+    one level at a time.
+    """
     log.debug("get_places_hierarchy(%s, %s)"%(place_ids, hier_ids))
-    for place_id in place_ids:
-        if place_id not in hier_ids:
-            place_node, place_rdf = get_geonames_place_rdf(place_id)
-            place_name, place_type, parent_id = (
-                get_geonames_place_name_type_parent(place_node, place_rdf)
-                )
-            hier_ids[place_id] = (place_id, place_name, place_type)
-            if parent_id:
-                hier_ids   = get_places_hierarchy([parent_id], hier_ids)
-    return hier_ids
+    def parent_feature_ids(place_data):
+        return [place_data[2]] if place_data[2] else []
+    return get_hierarchy_levels(place_ids, hier_ids, parent_feature_ids)
 
 def do_get_place_hierarchy(gcdroot, options):
-    geo_ont_rdf = get_geonames_ontology()
+    geo_type_labels = get_geonames_type_labels()
     geonames_id = getargvalue(getarg(options.args, 0), "GeoNames Id: ")
     #@@ follow parentFeature links: results are inconsistent.
     # hier_id_name_types = get_places_hierarchy([geonames_id], {})
     #@@
-    hier_id_name_types = get_place_admin_hierarchy([geonames_id], {})
+    hier_id_name_types = get_place_admin_hierarchy([geonames_id], collections.OrderedDict())
     for p, n, t in hier_id_name_types.values():
-        print(format_id_name(p, n, t, geo_ont_rdf), file=sys.stdout)
+        print(format_id_name(p, n, t, geo_type_labels), file=sys.stdout)
     return GCD_SUCCESS
 
 def do_get_many_place_hierarchy(gcdroot, options):
-    geo_ont_rdf = get_geonames_ontology()
-    place_ids   = get_many_geonames_ids()
+    geo_type_labels = get_geonames_type_labels()
+    place_ids       = get_many_geonames_ids()
     if not place_ids:
         return GCD_NO_GEONAMES_IDS
+    if get_geonames_dump():
+        get_geonames_dump().preload(place_ids)
     #@@ follow parentFeature links: results are inconsistent.
     # hier_id_name_types = get_places_hierarchy(place_ids, {})
     #@@
-    hier_id_name_types = get_place_admin_hierarchy(place_ids, {})
+    hier_id_name_types = get_place_admin_hierarchy(place_ids, collections.OrderedDict())
     for p, n, t in hier_id_name_types.values():
-        print(format_id_name(p, n, t, geo_ont_rdf), file=sys.stdout)
+        print(format_id_name(p, n, t, geo_type_labels), file=sys.stdout)
     return GCD_SUCCESS
 
 def extract_geonames_id(url, rex):
@@ -1108,15 +1857,6 @@ def do_extract_many_geonames_ids(gcdroot, options):
             status = GCD_SUCCESS
     return status
 
-def get_wikidata_uri(wikidata_id):
-    """
-    Returns Wikidata place URI, given Wikidata ID (e.g. "Q92212")
-    """
-    wikidata_base_uri = "http://www.wikidata.org/entity/"
-    wikidata_uri     = urlparse.urljoin(wikidata_base_uri, wikidata_id)
-    wikidata_url     = find_entity_url(wikidata_uri, "text/turtle")
-    return (wikidata_uri, wikidata_url)
-
 def get_wikidata_id(wikidata_uri):
     """
     Returns Wikidata ID (e.g. "Q92212") given Wikidata entity URI, or None.
@@ -1132,10 +1872,48 @@ def get_wikidata_id_data(wikidata_id, result_rdf=None):
     """
     Get Wikidata place data for a given wikidata id
     """
-    wikidata_uri, wikidata_url = get_wikidata_uri(wikidata_id)
-    # print("wikidata_uri: %s"%(wikidata_uri,), file=sys.stderr)
-    # print("wikidata_url: %s"%(wikidata_url,), file=sys.stderr)
-    wikidata_rdf = get_rdf_graph(wikidata_url, format="turtle")
+    store        = get_wikidata_entity_store()
+    wikidata_rdf = store.get_entity_graph(wikidata_id)
+    return map_wikidata_place_data(
+        wikidata_id, str(WD[wikidata_id]), store.entity_data_url(wikidata_id), 
+        wikidata_rdf, result_rdf=result_rdf
+        )
+
+def get_many_wikidata_api_data(wikidata_ids):
+    """
+    Get Wikidata place data for a list of Wikidata ids, using the Wikidata API
+    to retrieve data for many entities with each request (see '--wikidata-api').
+
+    Returns a list of (wikidata_id, result_rdf, exception) tuples, in the same 
+    form as `FetchEngine.map`.
+    """
+    store         = get_wikidata_entity_store()
+    entity_graphs = store.get_entity_graphs(wikidata_ids)
+    results       = []
+    for wikidata_id in wikidata_ids:
+        print("wikidata_id: %s"%(wikidata_id,), file=sys.stderr)
+        try:
+            if entity_graphs[wikidata_id] is None:
+                raise ValueError("No Wikidata entity %s"%(wikidata_id,))
+            result_rdf = map_wikidata_place_data(
+                wikidata_id, str(WD[wikidata_id]), store.entity_data_url(wikidata_id), 
+                entity_graphs[wikidata_id]
+                )
+            results.append((wikidata_id, result_rdf, None))
+        except Exception as e:
+            results.append((wikidata_id, None, e))
+    return results
+
+def map_wikidata_place_data(
+    wikidata_id, wikidata_uri, wikidata_url, wikidata_rdf, result_rdf=None
+    ):
+    """
+    Map Wikidata place data for a given wikidata id to EMPlaces data.
+
+    wikidata_url    is the URL of the Wikidata data, which is referenced as the
+                    source of the EMPlaces data.
+    wikidata_rdf    is a graph of Wikidata data for the place.
+    """
     # Get identifiers, URIs and other values from wikidata RDF
     # (Geonames Id is needed to connect with EMPlaces merged data)
     emp_id_wikidata, emp_uri_wikidata, emp_node_wikidata = get_emplaces_uri_node(
@@ -1161,15 +1939,11 @@ def get_wikidata_id_data(wikidata_id, result_rdf=None):
     for prefix, ns_uri in wikidata_rdf.namespaces():
         result_rdf.bind(prefix, ns_uri)
     # ----- Map required data to result graph -----
-    merged_place_mapping = get_wikidata_merged_place_mapping(
+    place_params = get_wikidata_place_params(
         emp_id_merged, emp_id_wikidata, wikidata_url, place_name
         )
-    wikidata_data_mapping = get_wikidata_sourced_place_mapping(
-        emp_id_wikidata, wikidata_url
-        )
-    m = DataExtractMap(wikidata_uri, wikidata_rdf, result_rdf)
-    m.extract_map(merged_place_mapping)
-    m.extract_map(wikidata_data_mapping)
+    m = DataExtractMap(wikidata_uri, wikidata_rdf, result_rdf, params=place_params)
+    m.run_plan(WIKIDATA_PLACE_PLAN)
     return result_rdf
 
 def get_wikidata_id_text(wikidata_id, result_rdf=None):
@@ -1179,11 +1953,13 @@ def get_wikidata_id_text(wikidata_id, result_rdf=None):
     article_root = "https://en.wikipedia.org/wiki/"
     summary_root = "https://en.wikipedia.org/api/rest_v1/page/summary/"
     wiki_root    = "https://en.wikipedia.org/"
-    # Get wikidata data
-    wikidata_uri, wikidata_url = get_wikidata_uri(wikidata_id)
+    # Get wikidata data (shared with `get_wikidata_id_data`)
+    store        = get_wikidata_entity_store()
+    wikidata_uri = str(WD[wikidata_id])
+    wikidata_url = store.entity_data_url(wikidata_id)
     print("wikidata_uri: %s"%(wikidata_uri,), file=sys.stderr)
     print("wikidata_url: %s"%(wikidata_url,), file=sys.stderr)
-    wikidata_rdf = get_rdf_graph(wikidata_url, format="turtle")
+    wikidata_rdf = store.get_entity_graph(wikidata_id)
     # print(wikidata_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
     summary_url  = None
     summary_data = None
@@ -1214,12 +1990,7 @@ def get_wikidata_id_text(wikidata_id, result_rdf=None):
         # Content-Type: application/json; charset=utf-8; profile="https://www.mediawiki.org/wiki/Specs/Summary/1.4.0"
         # "extract": "Opole (listen) is a city located in southern Poland on the Oder River and the historical capital of Upper Silesia. With a population of approximately 127,792, it is currently the capital of the Opole Voivodeship and, also the seat of Opole County. With its long history dating back to the 8th century, Opole is one of the oldest cities in Poland.",
         # "extract_html": "<p><b>Opole</b> <span class=\"nowrap\" style=\"font-size:85%;\">(<span class=\"unicode haudio\"><span class=\"fn\"><span><figure-inline><span><img src=\"//upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Loudspeaker.svg/11px-Loudspeaker.svg.png\" height=\"11\" width=\"11\" srcset=\"//upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Loudspeaker.svg/22px-Loudspeaker.svg.png 2x, //upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Loudspeaker.svg/17px-Loudspeaker.svg.png 1.5x\" /></span></figure-inline></span>listen</span></span>)</span> is a city located in southern Poland on the Oder River and the historical capital of Upper Silesia. With a population of approximately 127,792, it is currently the capital of the Opole Voivodeship and, also the seat of Opole County. With its long history dating back to the 8th century, Opole is one of the oldest cities in Poland.</p>"
-        req_headers = (
-            { "accept":     "application/json" 
-            })
-        response = requests.get(summary_url, headers=req_headers)
-        response.raise_for_status()  # raise an error on unsuccessful status codes
-        summary_data = json.loads(response.text)
+        summary_data = json.loads(get_rdf_resource(summary_url, "json"))
     if summary_data:
         # Assemble result graph (using EMPlaces structure)
         emp_id_wikidata, emp_uri_wikidata, emp_node_wikidata = get_emplaces_uri_node(wikidata_id, suffix="_wikidata")
@@ -1231,6 +2002,19 @@ def get_wikidata_id_text(wikidata_id, result_rdf=None):
         result_rdf.add((emp_node_wikidata, EM.description, Literal(summary_text)))
     return result_rdf
 
+def wikidata_entity_host(wikidata_id):
+    """
+    Returns the host accessed when retrieving data for a Wikidata entity.
+    (Used by fetch engines that limit concurrency per host.)
+    """
+    return "www.wikidata.org"
+
+def wikidata_query_host(geo_id):
+    """
+    Returns the host accessed when querying Wikidata for a GeoNames Id.
+    """
+    return "query.wikidata.org"
+
 def wikidata_sparql_query(query, endpoint="https://query.wikidata.org/sparql"):
     query_url      = make_query_url(endpoint, query=query)
     # print("@@@ query URL:\n--\n%s\n--"%(query_url,), file=sys.stderr)
@@ -1238,6 +2022,23 @@ def wikidata_sparql_query(query, endpoint="https://query.wikidata.org/sparql"):
     # print("@@@ query_response:\n--\n%s\n--"%(query_response,), file=sys.stderr)
     return json.loads(query_response)
 
+def wikidata_id_status(geo_id, ids_uris_labels):
+    """
+    For given GeoNames Id and list of matching Wikidata (id, uri, label) tuples,
+    report any problem and return:
+
+    (status, None)              if none or many Wikidata ids were found
+    (status, (id, uri, label))  if a single wikidata id was found
+    """
+    if len(ids_uris_labels) == 0:
+        print("No Wikidata IDs found for GeoNames Id %s"%(geo_id,), file=sys.stderr)
+        return (GCD_NO_WIKIDATA_IDS, None)
+    elif len(ids_uris_labels) != 1:
+        print("Multiple Wikidata IDs found for GeoNames Id %s:"%(geo_id,), file=sys.stderr)
+        print("  %s"%([i for i,u,l in ids_uris_labels],), file=sys.stderr)
+        return (GCD_MANY_WIKIDATA_IDS, None)
+    return (GCD_SUCCESS, ids_uris_labels[0])
+
 def extrtact_wikidata_id(geo_id):
     """
     Gor given GeoNames Id, return:
@@ -1263,14 +2064,50 @@ def extrtact_wikidata_id(geo_id):
           ) 
           for b in result_bindings 
         ])
-    if len(ids_uris_labels) == 0:
-        print("No Wikidata IDs found for GeoNames Id %s"%(geo_id,), file=sys.stderr)
-        return (GCD_NO_WIKIDATA_IDS, None)
-    elif len(ids_uris_labels) != 1:
-        print("Multiple Wikidata IDs found for GeoNames Id %s:"%(geo_id,), file=sys.stderr)
-        print("  %s"%([i for i,u,l in ids_uris_labels],), file=sys.stderr)
-        return (GCD_MANY_WIKIDATA_IDS, None)
-    return (GCD_SUCCESS, ids_uris_labels[0])
+    return wikidata_id_status(geo_id, ids_uris_labels)
+
+def extract_many_wikidata_ids(geo_ids):
+    """
+    For a list of GeoNames Ids, query Wikidata for all of them using a single
+    SPARQL query.
+
+    Returns a dictionary that maps each of the supplied GeoNames Ids to a list
+    of (id, uri, label) tuples for the matching Wikidata items.
+
+    A GeoNames Id that is supplied more than once is included in the query just
+    once, as each matching item would otherwise be returned for each copy.
+    """
+    geo_ids_uris_labels = {}
+    distinct_geo_ids    = []
+    for g in geo_ids:
+        if g not in geo_ids_uris_labels:
+            geo_ids_uris_labels[g] = []
+            distinct_geo_ids.append(g)
+    geo_id_values = " ".join(
+        [ '"%s"'%(g.replace("\\", "\\\\").replace('"', '\\"'),) for g in distinct_geo_ids ]
+        )
+    wikidata_query = ("""
+        SELECT ?gid ?item ?itemLabel 
+        WHERE 
+        {
+          VALUES ?gid { %s }
+          ?item wdt:P1566 ?gid .
+          SERVICE wikibase:label 
+            { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en". }
+        }
+        """)%(geo_id_values,)
+    query_response_dict = wikidata_sparql_query(wikidata_query)
+    result_bindings = query_response_dict["results"]["bindings"]
+    for b in result_bindings:
+        id_uri_label = (
+            ( get_wikidata_id(b["item"]["value"])
+            , b["item"]["value"]
+            , b["itemLabel"]["value"]
+            ))
+        ids_uris_labels = geo_ids_uris_labels.setdefault(b["gid"]["value"], [])
+        if id_uri_label not in ids_uris_labels:
+            ids_uris_labels.append(id_uri_label)
+    return geo_ids_uris_labels
 
 def do_extract_wikidata_id(gcdroot, options):
     geo_id  = getargvalue(getarg(options.args, 0), "GeoNames Id: ")
@@ -1284,13 +2121,30 @@ def do_extract_many_wikidata_ids(gcdroot, options):
     gids   = get_many_geonames_ids()
     if not gids:
         return GCD_NO_GEONAMES_IDS
+    # GeoNames Ids are resolved in batches, each using a single SPARQL query
+    gid_batches = (
+        [ tuple(gids[n:n+WIKIDATA_QUERY_BATCH_SIZE]) 
+          for n in range(0, len(gids), WIKIDATA_QUERY_BATCH_SIZE)
+        ])
     return_status = GCD_SUCCESS
-    for geo_id in gids:
-        status, wiki_id_uri_label = extrtact_wikidata_id(geo_id)
-        if status == GCD_SUCCESS:
-            print("%-16s # %s"%(wiki_id_uri_label[0],wiki_id_uri_label[2]), file=sys.stdout)
-        else:
-            return_status = status
+    for gid_batch, geo_ids_uris_labels, e in get_fetch_engine().map(
+        extract_many_wikidata_ids, gid_batches, wikidata_query_host
+        ):
+        if e is not None:
+            log.error(
+                "Error querying Wikidata for GeoNames Ids %s..%s (%s)"%
+                (gid_batch[0], gid_batch[-1], e)
+                )
+            return_status = GCD_NO_WIKIDATA_IDS
+            continue
+        for geo_id in gid_batch:
+            status, wiki_id_uri_label = wikidata_id_status(
+                geo_id, geo_ids_uris_labels[geo_id]
+                )
+            if status == GCD_SUCCESS:
+                print("%-16s # %s"%(wiki_id_uri_label[0],wiki_id_uri_label[2]), file=sys.stdout)
+            else:
+                return_status = status
     return return_status
 
 def do_get_wikidata_place_data(gcdroot, options):
@@ -1299,23 +2153,122 @@ def do_get_wikidata_place_data(gcdroot, options):
     """
     wikidata_id  = getargvalue(getarg(options.args, 0), "Wikidata ID: ")
     wikidata_rdf = get_wikidata_id_data(wikidata_id)
-    print(wikidata_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+    print_graph(options, wikidata_rdf)
     return GCD_SUCCESS
 
+def fetch_many(fetch_fn, items, item_host, batch_size=None):
+    """
+    Generator applies `fetch_fn` to each of the supplied items using the current
+    fetch engine, and yields (item, result, exception) tuples in input order.
+
+    If `batch_size` is given, items are passed to the fetch engine in batches of
+    that size, so that results for each batch can be used before the next batch
+    is fetched.
+    """
+    batch_size = batch_size or max(len(items), 1)
+    for n in range(0, len(items), batch_size):
+        for result in get_fetch_engine().map(
+            fetch_fn, items[n:n+batch_size], item_host
+            ):
+            yield result
+    return
+
+def fetch_many_wikidata_api_data(wikidata_ids, batch_size=None):
+    """
+    Generator uses the Wikidata API to get Wikidata place data for each of the 
+    supplied Wikidata Ids, and yields (wikidata_id, result_rdf, exception) tuples
+    in input order.
+
+    Wikidata Ids are grouped into batches of WIKIDATA_API_BATCH_SIZE, each of
+    which is fetched with a single API request using the current fetch engine.
+    If `batch_size` is given, results are yielded for each group of (about) 
+    that many Ids before the next group is fetched.
+    """
+    api_batches = (
+        [ wikidata_ids[n:n+WIKIDATA_API_BATCH_SIZE] 
+          for n in range(0, len(wikidata_ids), WIKIDATA_API_BATCH_SIZE)
+        ])
+    if batch_size:
+        batch_size = max(batch_size // WIKIDATA_API_BATCH_SIZE, 1)
+    for api_batch, batch_results, e in fetch_many(
+        get_many_wikidata_api_data, api_batches, wikidata_entity_host, 
+        batch_size=batch_size
+        ):
+        if e is not None:
+            for wikidata_id in api_batch:
+                yield (wikidata_id, None, e)
+        else:
+            for result in batch_results:
+                yield result
+    return
+
+def prefetch_wikidata_entities(wikidata_ids):
+    """
+    Retrieve Wikidata entity data for the supplied Wikidata Ids using the Wikidata
+    API, WIKIDATA_API_BATCH_SIZE at a time, so that it is available from the 
+    Wikidata entity store and disk cache.  Failures are logged here, and 
+    reported again when the affected entity is used.
+    """
+    api_batches = (
+        [ wikidata_ids[n:n+WIKIDATA_API_BATCH_SIZE] 
+          for n in range(0, len(wikidata_ids), WIKIDATA_API_BATCH_SIZE)
+        ])
+    for api_batch, _, e in get_fetch_engine().map(
+        get_wikidata_entity_store().get_entity_graphs, api_batches, wikidata_entity_host
+        ):
+        if e is not None:
+            log.warning("Prefetch of Wikidata entities %s failed (%s)"%("|".join(api_batch), e))
+    return
+
 def do_get_many_wikidata_place_data(gcdroot, options):
     """
     Get Wikidata RDF for multiple places
     """
+    def get_wikidata_place_data(wikidata_id):
+        print("wikidata_id: %s"%(wikidata_id,), file=sys.stderr)
+        return get_wikidata_id_data(wikidata_id)
     wids         = get_many_geonames_ids()
+    journal      = open_journal(options, "manygetwikidata")
+    if journal:
+        wids = journal.start_run(
+            wids, resume=options.resume, retry_failed=options.retry_failed
+            )
     wikidata_rdf = Graph()
     wikidata_rdf.bind("em",    EM.term(""))
     wikidata_rdf.bind("ems",   EMS.term(""))
     wikidata_rdf.bind("place", PLACE.term(""))
-    for wikidata_id in wids:
-        print("wikidata_id: %s"%(wikidata_id,), file=sys.stderr)
-        wikidata_rdf = get_wikidata_id_data(wikidata_id, result_rdf=wikidata_rdf)
+    writer       = get_stream_writer(options, wikidata_rdf) if options.stream else None
+    if options.wikidata_api:
+        results = fetch_many_wikidata_api_data(
+            wids, batch_size=STREAM_BATCH_SIZE if writer else None
+            )
+    else:
+        results = fetch_many(
+            get_wikidata_place_data, wids, wikidata_entity_host, 
+            batch_size=STREAM_BATCH_SIZE if writer else None
+            )
+    for wikidata_id, place_rdf, e in results:
+        if e is not None:
+            log.error(
+                "Error getting data for Wikidata Id %s (%s)"%(wikidata_id, error_text(e))
+                )
+            if journal:
+                journal.mark_failed(wikidata_id, e)
+        elif writer:
+            writer.write_graph(place_rdf)
+            if journal:
+                journal.mark_done(wikidata_id)
+        else:
+            add_graph_data(wikidata_rdf, place_rdf)
     print(".", file=sys.stderr)
-    print(wikidata_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+    if writer:
+        writer.close()
+    else:
+        print_graph(options, wikidata_rdf)
+    if journal:
+        journal.mark_pending_done(wids)
+        journal.log_summary()
+        journal.close()
     return GCD_SUCCESS
 
 def do_get_wikidata_place_text(gcdroot, options):
@@ -1324,7 +2277,7 @@ def do_get_wikidata_place_text(gcdroot, options):
     """
     wikidata_id  = getargvalue(getarg(options.args, 0), "Wikidata ID: ")
     wikidata_rdf = get_wikidata_id_text(wikidata_id)
-    print(wikidata_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+    print_graph(options, wikidata_rdf)
     return GCD_SUCCESS
 
 def do_get_many_wikidata_place_text(gcdroot, options):
@@ -1332,12 +2285,41 @@ def do_get_many_wikidata_place_text(gcdroot, options):
     Get Wikidata (Wikipedia) description text for a place, as EMPlaces format RDF.
     """
     wids         = get_many_geonames_ids()
+    journal      = open_journal(options, "manygetwikitext")
+    if journal:
+        wids = journal.start_run(
+            wids, resume=options.resume, retry_failed=options.retry_failed
+            )
     wikidata_rdf = Graph()
     wikidata_rdf.bind("em",    EM.term(""))
     wikidata_rdf.bind("place", PLACE.term(""))
-    for wikidata_id in wids:
-        wikidata_rdf = get_wikidata_id_text(wikidata_id, result_rdf=wikidata_rdf)
-    print(wikidata_rdf.serialize(format='turtle', indent=4), file=sys.stdout)
+    writer       = get_stream_writer(options, wikidata_rdf) if options.stream else None
+    if options.wikidata_api:
+        prefetch_wikidata_entities(wids)
+    for wikidata_id, place_rdf, e in fetch_many(
+        get_wikidata_id_text, wids, wikidata_entity_host, 
+        batch_size=STREAM_BATCH_SIZE if writer else None
+        ):
+        if e is not None:
+            log.error(
+                "Error getting text for Wikidata Id %s (%s)"%(wikidata_id, error_text(e))
+                )
+            if journal:
+                journal.mark_failed(wikidata_id, e)
+        elif writer:
+            writer.write_graph(place_rdf)
+            if journal:
+                journal.mark_done(wikidata_id)
+        elif place_rdf is not None:
+            add_graph_data(wikidata_rdf, place_rdf)
+    if writer:
+        writer.close()
+    else:
+        print_graph(options, wikidata_rdf)
+    if journal:
+        journal.mark_pending_done(wids)
+        journal.log_summary()
+        journal.close()
     return GCD_SUCCESS
 
 #   ===================================================================
@@ -1386,6 +2368,33 @@ def run(userhome, userconfig, options, progname):
     print("Use '%s --help' to see usage summary"%(progname), file=sys.stderr)
     return GCD_BADCMD
 
+def get_options_fetch_engine(options):
+    """
+    Returns a fetch engine selected by the supplied command line options.
+    """
+    if options.fetch_engine == "hosts":
+        return HostLimitedFetchEngine(host_limits=parse_host_limits(options.host_limits))
+    if options.prefetch_threads > 0:
+        return ThreadPoolFetchEngine(options.prefetch_threads)
+    return SerialFetchEngine()
+
+def configure_options_http_transport(options, fetch_engine, rate_share=1.0):
+    """
+    Configures the shared HTTP transport as selected by the supplied command 
+    line options, with enough pooled connections for the supplied fetch engine.
+
+    rate_share  is the fraction of each host's request rate limit that is used
+                by this process (see `RateLimiter`).
+    """
+    return configure_http_transport(
+        pool_maxsize=options.http_pool_size or max(10, fetch_engine.max_concurrency), 
+        read_timeout=options.http_timeout,
+        retry_policy=RetryPolicy(max_retries=options.max_retries),
+        rate_limiter=RateLimiter(
+            parse_host_rates(options.host_rates), rate_share=rate_share
+            )
+        )
+
 def runCommand(userhome, userconfig, argv):
     """
     Run program with supplied configuration base directory, 
@@ -1403,8 +2412,29 @@ def runCommand(userhome, userconfig, argv):
     log.debug("runCommand: userhome %s, userconfig %s, argv %s"%(userhome, userconfig, repr(argv)))
     log.debug("Options: %s"%(repr(options)))
     if options:
+        set_disk_cache_dir(
+            options.cache_dir or 
+            os.environ.get(CACHE_DIR_ENV) or 
+            os.path.join(userconfig, "rdf_data_cache"),
+            revalidate=options.revalidate
+            )
+        fetch_engine = get_options_fetch_engine(options)
+        set_fetch_engine(fetch_engine)
+        configure_options_http_transport(options, fetch_engine)
+        if options.geonames_dump:
+            set_geonames_dump(GeoNamesDump(options.geonames_dump))
+        set_wikidata_entity_store(
+            WikidataEntityStore(
+                use_api=options.wikidata_api, properties=WIKIDATA_PLACE_PROPERTIES
+                )
+            )
+        set_graph_cache_limits(
+            max_entries=options.graph_cache_size, 
+            max_triples=options.graph_cache_triples
+            )
         progname = os.path.basename(argv[0])
         status   = run(userhome, userconfig, options, progname)
+        log_graph_cache_stats()
     else:
         status = GCD_BADCMD
     return status